@@ -1,4 +1,8 @@
 # app.py
+import glob
+import logging
+import os
+from concurrent.futures.process import BrokenProcessPool
 import streamlit as st
 import pandas as pd
 import plotly.express as px
@@ -16,32 +20,438 @@ from processing import (
     step_tokenize_tweets,
     step_remove_short_words_from_tokens,
     step_rejoin_tokens,
-    # Sentiment analysis function:
-    analyze_sentiment_vader
+    # Sentiment analysis functions:
+    clean_tweets,
+    score_sentiment,
+    get_score_cache,
+    SCORE_CACHE_PATH,
+    SCORING_ENGINES,
+    # Streaming mode (chunked reading, aggregates only):
+    analyze_csv_streaming,
+    iter_analyzed_chunks,
+    new_sentiment_aggregates,
+    update_sentiment_aggregates,
+    sentiment_counts_from_aggregates,
+    sentiment_over_time_from_aggregates,
+    score_histogram_from_aggregates,
+    likes_score_density_from_aggregates,
+    stratified_sample,
 )
+from columnar_dataset import ColumnarDataset, open_tweet_dataset, csv_fingerprint
+from incremental import run_incremental_analysis
+from jobs import JobScheduler
+from export import export_results, iter_frame_chunks, read_export, EXPORT_BASE_COLUMNS, EXPORT_EXTRA_COLUMNS, EXPORT_MIME_TYPES
+from profiling import StageProfiler, clear_active_profiler, profile_stage, profiled_stage
+from shared_store import get_shared_store, analysis_key
+
+DATA_FILE = 'chatgpt1.csv'
+STREAMING_PREVIEW_ROWS = 5_000
+ANALYSIS_MODES = {
+    'memory': "En mémoire",
+    'streaming': "Streaming (fichiers volumineux)",
+    'incremental': "Incrémental (nouveaux tweets seulement)",
+}
+SCORING_ENGINE_LABELS = {
+    'vader': "VADER (texte par texte)",
+    'vectorized': "VADER vectorisé (NumPy)",
+}
+SENTIMENT_COLORS = {'Positive':'green', 'Negative':'red', 'Neutral':'grey'}
+# Above SCATTER_MAX_POINTS analyzed tweets, the likes vs score scatter is replaced by
+# a binned density or a stratified sample, so the chart payload stays bounded.
+SCATTER_MAX_POINTS = 20_000
+SCATTER_MODES = {
+    'density': "Densité (cases)",
+    'sample': "Échantillon stratifié",
+}
+EXPORT_FORMAT_LABELS = {
+    'csv': "CSV",
+    'csv.gz': "CSV compressé (gzip)",
+    'parquet': "Parquet",
+}
+# The step-by-step cleaning preview runs on the first CLEANING_PREVIEW_ROWS filtered
+# tweets only, shown CLEANING_PREVIEW_PAGE_SIZE rows at a time.
+CLEANING_PREVIEW_ROWS = 500
+CLEANING_PREVIEW_PAGE_SIZE = 5
+CLEANING_PREVIEW_STEPS = [
+    ('Supprimer les fichiers en double et convertir tous les :blue[tweets] en minuscules :', step_deduplicate_and_lowercase, 'clean_tweet'),
+    ("Suppression de l'URL des :blue[tweets]", step_remove_urls, 'clean_tweet'),
+    ('Suppression des identifiants Twitter (@user)', step_remove_mentions, 'clean_tweet'),
+    ('Suppression des identifiants :blue[Twitter] (#hashtag)', step_remove_hashtags_words, 'clean_tweet'),
+    ('Suppression des identifiants :blue[Twitter] ($tickers)', step_remove_tickers_words, 'clean_tweet'),
+    ('Suppression de la ponctuation (!,?,..), des chiffres et des caractères spéciaux', step_remove_punctuation_numbers_special, 'clean_tweet'),
+    ('Tokénisation des :blue[tweets]: ', step_tokenize_tweets, 'clean_tweet_tokens'),
+    ('Suppression des mots courts : ', step_remove_short_words_from_tokens, 'clean_tweet_tokens'),
+    ('Recoller les jetons ensemble ', step_rejoin_tokens, 'clean_tweet'),
+]
+TREND_GRANULARITIES = {'D': "Jour", 'h': "Heure"}
+# Background jobs: CSV files offered for analysis, concurrent jobs and polling interval.
+JOB_INPUT_PATTERNS = ('*.csv', os.path.join('data', '*.csv'))
+JOBS_MAX_WORKERS = 2
+JOBS_POLL_SECONDS = 2
+JOB_STATUS_LABELS = {
+    'queued': "En attente",
+    'running': "En cours",
+    'done': "Terminée",
+    'failed': "Échec",
+    'interrupted': "Interrompue",
+}
+SHARED_STORE_BUDGET_BYTES = 1 << 30
 
 # --- UI: Navigation Bar ---
 def navBar():
     menu_data = [
         {'id': "Scrape Data From Twitter", 'icon': "fab fa-twitter", 'label': "Récupérer les données de Twitter"},
-        {'id': "Sentiment Analysis", 'icon': "far fa-chart-bar", 'label': "Analyse des sentiments"}
+        {'id': "Sentiment Analysis", 'icon': "far fa-chart-bar", 'label': "Analyse des sentiments"},
+        {'id': "Batch Jobs", 'icon': "fas fa-tasks", 'label': "Analyses en arrière-plan"}
     ]
     over_theme = {'txc_inactive': '#FFFFFF'}
     menu_id = hc.nav_bar(menu_definition=menu_data, override_theme=over_theme, first_select=0)
     return menu_id
 
+# --- UI: Result rendering (shared by all analysis modes) ---
+def render_results_header(selected_keywords):
+    st.write('------------------------------')
+    title_col1, title_col2, title_col3 = st.columns((1, 8, 2))
+    with title_col2:
+        st.title(f'Analyse des Sentiments Twitter sur :green[{" & ".join(selected_keywords)}]')
+    with title_col3:
+        try:
+            st.image('image.png', width=100)
+        except FileNotFoundError:
+            st.caption("image.png non trouvée")
+    st.write('------------------------------')
+
+def render_sentiment_stats(sentiment_counts, total_tweets):
+    total_analyzed_count = sentiment_counts.sum()
+    stat_col1, stat_col2, stat_col3, stat_col4 = st.columns(4)
+    if total_analyzed_count > 0:
+        pos_perc = (sentiment_counts.get('Positive', 0) / total_analyzed_count) * 100
+        neg_perc = (sentiment_counts.get('Negative', 0) / total_analyzed_count) * 100
+        neu_perc = (sentiment_counts.get('Neutral', 0) / total_analyzed_count) * 100
+        stat_col1.subheader(f"Positif (%): {pos_perc:.2f}%")
+        stat_col2.subheader(f"Négatif (%): {neg_perc:.2f}%")
+        stat_col3.subheader(f"Neutre (%): {neu_perc:.2f}%")
+    else:
+        stat_col1.subheader(f"Positif (%): N/A")
+        stat_col2.subheader(f"Négatif (%): N/A")
+        stat_col3.subheader(f"Neutre (%): N/A")
+    stat_col4.subheader(f"Total Tweets: {total_tweets}")
+    st.write('------------------------------')
+
+def render_sentiment_distribution(sentiment_counts):
+    df_grouped_for_charts = pd.DataFrame({'Sentiment': sentiment_counts.index, 'Count': sentiment_counts.values})
+    chart_row1_col1, chart_row1_col2 = st.columns(2)
+    with chart_row1_col1, profiled_stage('chart: sentiment histogram', len(df_grouped_for_charts)):
+        fig_hist = px.histogram(df_grouped_for_charts, x='Sentiment', y='Count', color='Sentiment', title="Distribution des Sentiments (Histogramme)", color_discrete_map=SENTIMENT_COLORS)
+        st.plotly_chart(fig_hist, use_container_width=True)
+    with chart_row1_col2, profiled_stage('chart: sentiment pie', len(df_grouped_for_charts)):
+        fig_pie = px.pie(df_grouped_for_charts, values='Count', names='Sentiment', title='Répartition des Sentiments (Circulaire)', color='Sentiment', color_discrete_map=SENTIMENT_COLORS)
+        st.plotly_chart(fig_pie, use_container_width=True)
+
+def render_sentiment_trend(aggregates):
+    freq = st.radio("Granularité", list(TREND_GRANULARITIES), format_func=TREND_GRANULARITIES.get, horizontal=True, key='trend_granularity')
+    try:
+        sentiment_over_time = sentiment_over_time_from_aggregates(aggregates, freq)
+    except Exception as e:
+        st.warning(f"Tendance non générée: Erreur Datetime - {e}")
+        return
+    if not sentiment_over_time.empty:
+        with profiled_stage('chart: sentiment trend', len(sentiment_over_time)):
+            fig_line = px.line(sentiment_over_time, x='Date', y='Count', color='Sentiment', title='Tendance des Sentiments au Fil du Temps', color_discrete_map=SENTIMENT_COLORS)
+            st.plotly_chart(fig_line, use_container_width=True)
+    else: st.caption("Tendance non générée: Pas de dates valides.")
+
+def render_likes_score_density(aggregates):
+    density = likes_score_density_from_aggregates(aggregates)
+    if density.empty:
+        st.caption("Graphique Likes vs Score non généré.")
+        return
+    with profiled_stage('chart: likes vs score density', density.size):
+        fig_density = px.imshow(density, origin='lower', aspect='auto', color_continuous_scale='Viridis', title='Likes vs. Score de Polarité (densité)', labels={'x': 'Nombre de Likes', 'y': 'Score de Polarité', 'color': 'Tweets'})
+        st.plotly_chart(fig_density, use_container_width=True)
+
+def render_likes_vs_score(aggregates, scatter_points, total_points):
+    # Raw points up to the threshold, then a stratified sample or the binned density.
+    if scatter_points is None:
+        render_likes_score_density(aggregates)
+        return
+    with profiled_stage('chart: likes vs score scatter', len(scatter_points)):
+        fig_scatter = px.scatter(scatter_points, x='LikeCount', y='Compound_Score', color='Sentiment', title='Likes vs. Score de Polarité', labels={'LikeCount': 'Nombre de Likes', 'Compound_Score': 'Score de Polarité'}, hover_data=['Text'] if 'Text' in scatter_points.columns else None, color_discrete_map=SENTIMENT_COLORS)
+        st.plotly_chart(fig_scatter, use_container_width=True)
+    if len(scatter_points) < total_points:
+        st.caption(f"Échantillon stratifié de {len(scatter_points)} tweets sur {total_points}.")
+
+def render_aggregate_dashboard(selected_keywords, aggregates):
+    # Charts for the streaming and incremental modes, built from aggregates only.
+    render_results_header(selected_keywords)
+    sentiment_counts = sentiment_counts_from_aggregates(aggregates)
+    render_sentiment_stats(sentiment_counts, aggregates['rows_analyzed'])
+    st.subheader('Visualisation du Résultat')
+    render_sentiment_distribution(sentiment_counts)
+    chart_row2_col1, chart_row2_col2 = st.columns(2)
+    with chart_row2_col1, profiled_stage('chart: score histogram', len(aggregates['score_histogram'])):
+        fig_scores = px.bar(score_histogram_from_aggregates(aggregates), x='Compound_Score', y='Count', title='Distribution des Scores de Polarité', labels={'Compound_Score': 'Score de Polarité', 'Count': 'Nombre de Tweets'})
+        st.plotly_chart(fig_scores, use_container_width=True)
+    with chart_row2_col2:
+        render_sentiment_trend(aggregates)
+    if not likes_score_density_from_aggregates(aggregates).empty:
+        render_likes_score_density(aggregates)
+
+# --- Data Sources ---
+@st.cache_resource(show_spinner="Préparation du jeu de données (conversion unique du CSV en format colonnes)...", max_entries=2)
+def get_tweet_dataset(file_path, file_mtime):
+    # file_mtime is only part of the cache key, so a re-exported file is re-ingested.
+    return open_tweet_dataset(file_path)
+
+@profile_stage
+def filter_tweets(tweet_source, selected_keywords):
+    # Index lookup on the columnar dataset; plain DataFrame filter on the streaming preview.
+    if isinstance(tweet_source, ColumnarDataset):
+        return tweet_source.filter(selected_keywords)
+    return filter_data_by_keywords_and_language(tweet_source, selected_keywords)
+
+# --- Shared Results ---
+# The streaming preview and the filtered and analyzed tweets are computed once per
+# process and shared by every session analyzing the same file and keywords (see
+# shared_store.py). The session keeps one handle per kind of result; replacing or
+# dropping a handle releases the session's reference.
+def get_dataset_fingerprint(file_path):
+    try:
+        return csv_fingerprint(file_path)
+    except OSError:
+        return None
+
+def get_source_fingerprint():
+    # The CSV version the session reads: a columnar dataset records the one it was built
+    # from, which the file on disk may have moved past since.
+    source = st.session_state.get('tweet_source')
+    return source.source if isinstance(source, ColumnarDataset) else get_dataset_fingerprint(DATA_FILE)
+
+def shared_result_key(kind, selected_keywords, language='en', engine=None):
+    return analysis_key(kind, get_source_fingerprint(), selected_keywords, language, engine)
+
+def get_shared_result(kind, selected_keywords, compute, language='en', engine=None):
+    key = shared_result_key(kind, selected_keywords, language, engine)
+    handles = st.session_state.setdefault('shared_handles', {})
+    handle = handles.get(kind)
+    if handle is None or handle.key != key:
+        if handle is not None: handle.release()
+        handles[kind] = handle = get_shared_store(SHARED_STORE_BUDGET_BYTES).acquire(key, compute)
+    return handle.value
+
+def render_shared_store_stats():
+    stats = get_shared_store(SHARED_STORE_BUDGET_BYTES).stats()
+    st.caption(f"Résultats partagés entre sessions : {stats['entries']} en mémoire ({stats['used_bytes'] / 2**20:.1f} Mo sur {stats['memory_budget'] / 2**20:.0f} Mo), "
+               f"{stats['references']} référence(s) de session, {stats['hits'] + stats['waits']} réutilisation(s), {stats['misses']} calcul(s), {stats['evictions']} éviction(s).")
+
+# --- Streaming Mode ---
+@profile_stage
+@st.cache_data(show_spinner=False)
+def run_streaming_analysis(file_path, selected_keywords, language, file_mtime, n_workers=1, cache_path=None, engine='vader'):
+    # file_mtime is only part of the cache key, so a re-exported file is re-analyzed.
+    return analyze_csv_streaming(file_path, list(selected_keywords), language, n_workers=n_workers, cache_path=cache_path, engine=engine)
+
+# --- Dashboard Rollups (in-memory mode) ---
+# Computed once per analyzed dataset: dataset_key is the shared-store key of the
+# analysis result (source, keywords, language, engine), so reruns reuse the rollups
+# without hashing the DataFrame.
+@st.cache_data(show_spinner=False, max_entries=8)
+def get_dashboard_aggregates(_df_analyzed, dataset_key):
+    return update_sentiment_aggregates(new_sentiment_aggregates(), _df_analyzed)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def get_scatter_points(_df_analyzed, dataset_key, max_points, scatter_mode):
+    # None when the density should be drawn instead of points.
+    if len(_df_analyzed) > max_points and scatter_mode == 'density': return None
+    columns = [col for col in ('LikeCount', 'Compound_Score', 'Sentiment', 'Text') if col in _df_analyzed.columns]
+    return stratified_sample(_df_analyzed[columns], max_points)
+
+# --- Cleaning Preview (in-memory mode) ---
+# The analysis cleans the full dataset with the fused clean_tweets; the step chain only
+# runs on a sample, when one of the preview expanders is open, and its intermediate
+# frames are memoized per dataset_key (the shared-store key of the filtered tweets).
+@st.cache_data(show_spinner=False, max_entries=8)
+def get_cleaning_previews(_df, dataset_key, sample_rows):
+    df = _df.head(sample_rows)
+    previews = []
+    for _, step, column in CLEANING_PREVIEW_STEPS:
+        df = step(df)
+        previews.append(df[['Text', column]].reset_index(drop=True))
+    return previews
+
+def render_cleaning_preview(previews):
+    total = len(previews[-1])
+    pages = max(1, -(-total // CLEANING_PREVIEW_PAGE_SIZE))
+    if st.session_state.get('cleaning_preview_page', 1) > pages: st.session_state.cleaning_preview_page = pages
+    page = int(st.number_input("Page de l'aperçu", min_value=1, max_value=pages, value=1, step=1, key='cleaning_preview_page'))
+    st.caption(f"Aperçu calculé sur les {total} premiers tweets uniques ; l'analyse nettoie l'ensemble des tweets en une seule passe.")
+    start = (page - 1) * CLEANING_PREVIEW_PAGE_SIZE
+    for (title, _, _), preview in zip(CLEANING_PREVIEW_STEPS, previews):
+        st.subheader(title)
+        st.table(preview.iloc[start:start + CLEANING_PREVIEW_PAGE_SIZE])
+
+def render_score_cache_stats(cache_path):
+    if cache_path is None: return
+    stats = get_score_cache(cache_path).stats()
+    st.caption(f"Cache des scores : {stats['hit_rate']:.1%} de textes déjà connus ({stats['hits']} trouvés, {stats['misses']} calculés, {stats['entries']} en cache).")
+
+# --- Export ---
+# The download button only writes the export when clicked (Streamlit runs the callable
+# in a background thread), chunk by chunk to a file that is reused by later downloads
+# of the same result, format and columns (see export.py).
+def render_export_controls(source_key, chunks, available_columns=EXPORT_EXTRA_COLUMNS, key='export'):
+    format_col, columns_col = st.columns(2)
+    output_format = format_col.selectbox("Format d'export", list(EXPORT_FORMAT_LABELS), format_func=EXPORT_FORMAT_LABELS.get, key=f'{key}_format')
+    extra_columns = columns_col.multiselect("Colonnes supplémentaires", [col for col in EXPORT_EXTRA_COLUMNS if col in available_columns], key=f'{key}_columns')
+    columns = EXPORT_BASE_COLUMNS + extra_columns
+    st.download_button(label='Télécharger les tweets analysés', data=lambda: read_export(export_results(source_key, chunks, output_format, columns)),
+                       file_name=f'sentiments_data.{output_format}', mime=EXPORT_MIME_TYPES[output_format], on_click='ignore', key=f'{key}_download')
+
+def get_file_mtime(file_path):
+    try:
+        return os.path.getmtime(file_path)
+    except OSError:
+        return None
+
+# --- Background Jobs ---
+# Jobs run in worker processes shared by all sessions (see jobs.py); the page only polls
+# their progress and reads the aggregates of finished jobs from disk.
+@st.cache_resource(show_spinner=False)
+def get_job_scheduler():
+    return JobScheduler(max_workers=JOBS_MAX_WORKERS)
+
+def list_job_inputs():
+    return sorted({path for pattern in JOB_INPUT_PATTERNS for path in glob.glob(pattern)})
+
+def parse_keyword_sets(text):
+    # One keyword set per line, keywords separated by commas.
+    keyword_sets = [[keyword.strip() for keyword in line.split(',') if keyword.strip()] for line in text.splitlines()]
+    return [keywords for keywords in keyword_sets if keywords]
+
+def job_label(job):
+    return f"{os.path.basename(job['input'])} — {', '.join(job['keywords'])} ({job['language']})"
+
+@st.fragment(run_every=JOBS_POLL_SECONDS)
+def render_jobs_progress():
+    jobs = get_job_scheduler().jobs()
+    if not jobs:
+        st.info("Aucune analyse soumise pour le moment.")
+        return
+    st.dataframe(pd.DataFrame([{
+        'Fichier': os.path.basename(job['input']), 'Mots-clés': ', '.join(job['keywords']), 'Langue': job['language'],
+        'Statut': JOB_STATUS_LABELS.get(job['status'], job['status']), 'Progression': job['progress'] * 100,
+        'Lignes lues': job['rows_read'], 'Tweets analysés': job['rows_analyzed'], 'Erreur': job['error'],
+    } for job in jobs]), hide_index=True, use_container_width=True,
+        column_config={'Progression': st.column_config.ProgressColumn(min_value=0, max_value=100, format='%.0f%%')})
+    # A job finished since the last poll: rerun the whole page to show its results.
+    done_count = sum(job['status'] == 'done' for job in jobs)
+    if st.session_state.setdefault('jobs_done_count', done_count) != done_count:
+        st.session_state.jobs_done_count = done_count
+        st.rerun()
+
+def render_finished_jobs():
+    scheduler = get_job_scheduler()
+    done_jobs = [job for job in scheduler.jobs() if job['status'] == 'done']
+    if not done_jobs: return
+    st.subheader('Comparaison des analyses terminées')
+    comparison = scheduler.comparison()
+    for label in SENTIMENT_COLORS:
+        comparison[label] = comparison[label] * 100
+    st.dataframe(comparison.rename(columns={'file': 'Fichier', 'keywords': 'Mots-clés', 'language': 'Langue', 'tweets': 'Tweets analysés'}),
+                 hide_index=True, use_container_width=True, column_config={label: st.column_config.NumberColumn(format='%.1f%%') for label in SENTIMENT_COLORS})
+    jobs_by_id = {job['id']: job for job in done_jobs}
+    job_id = st.selectbox("Afficher les résultats de l'analyse", list(jobs_by_id), format_func=lambda job_id: job_label(jobs_by_id[job_id]), key='job_results_select')
+    job = jobs_by_id[job_id]
+    st.download_button(label='Télécharger les tweets analysés (Parquet)', data=lambda: read_export(job['results']),
+                       file_name=os.path.basename(job['results']), mime=EXPORT_MIME_TYPES['parquet'], on_click='ignore', key='job_results_download')
+    render_aggregate_dashboard(job['keywords'], scheduler.aggregates(job_id))
+
+# --- Performance Panel ---
+def render_performance_panel(profiler):
+    # Stage timings of this run (pipeline stages and chart blocks), also sent to the logs.
+    profiler.log_summary()
+    with st.expander('Performance', expanded=True):
+        summary = profiler.summary()
+        if summary.empty:
+            st.caption("Aucune étape mesurée pendant cette exécution.")
+        else:
+            summary['stage'] = ['\u2003' * depth + stage for stage, depth in zip(summary['stage'], summary['depth'])]
+            st.dataframe(summary.drop(columns=['depth']), hide_index=True, use_container_width=True)
+        hot_functions = profiler.hot_functions()
+        if not hot_functions.empty:
+            st.caption("Fonctions les plus coûteuses (cProfile, temps cumulé) :")
+            st.dataframe(hot_functions, hide_index=True, use_container_width=True)
+        render_shared_store_stats()
+        st.download_button(label='Télécharger les mesures (JSON)', data=profiler.to_json().encode('utf-8'), file_name='performance.json', mime='application/json')
+
 # --- Main App Logic ---
 st.set_page_config(page_title='Sentiment Analyzer', layout="wide")
 
+analysis_mode = st.sidebar.radio(
+    "Mode d'analyse", list(ANALYSIS_MODES), format_func=ANALYSIS_MODES.get, key='analysis_mode',
+    help="Streaming : le fichier est analysé par morceaux en ne conservant que les agrégats, la mémoire reste bornée quelle que soit la taille du fichier (l'exploration n'affiche alors qu'un aperçu). "
+         "Incrémental : seuls les tweets ajoutés au fichier depuis la dernière analyse sont nettoyés et scorés, puis fusionnés aux résultats enregistrés."
+)
+streaming_mode = analysis_mode == 'streaming'
+scoring_engine = st.sidebar.selectbox(
+    "Moteur de scoring", SCORING_ENGINES, format_func=SCORING_ENGINE_LABELS.get, key='scoring_engine',
+    help="Le moteur vectorisé applique les règles de VADER à tout un lot de tweets avec NumPy : mêmes scores, beaucoup plus rapide."
+)
+scoring_workers = int(st.sidebar.number_input(
+    "Processus pour le scoring VADER", min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1,
+    key='scoring_workers', disabled=scoring_engine != 'vader',
+    help="Les tweets nettoyés sont répartis entre plusieurs processus ; le résultat est identique au calcul séquentiel. Le moteur vectorisé n'utilise qu'un processus."
+))
+use_score_cache = st.sidebar.checkbox(
+    "Cache persistant des scores", value=True, key='use_score_cache',
+    help="Les textes nettoyés déjà vus (retweets, tweets identiques, analyses précédentes) ne repassent pas par VADER."
+)
+score_cache_path = SCORE_CACHE_PATH if use_score_cache else None
+scatter_max_points = int(st.sidebar.number_input(
+    "Seuil du nuage de points (tweets)", min_value=1_000, max_value=500_000, value=SCATTER_MAX_POINTS, step=1_000,
+    key='scatter_max_points', help="Au-delà de ce nombre de tweets analysés, le graphique Likes vs Score n'affiche plus chaque tweet."
+))
+scatter_mode = st.sidebar.selectbox(
+    "Au-delà du seuil", list(SCATTER_MODES), format_func=SCATTER_MODES.get, key='scatter_mode',
+    help="Densité : nombre de tweets par case (likes × score). Échantillon : tirage proportionnel à chaque sentiment."
+)
+show_performance = st.sidebar.checkbox(
+    "Panneau de performance", value=False, key='show_performance',
+    help="Mesure le temps, les lignes en entrée/sortie et la variation mémoire de chaque étape (filtrage, nettoyage, VADER, graphiques) pendant cette exécution."
+)
+use_cprofile = show_performance and st.sidebar.checkbox(
+    "Profilage détaillé (cProfile)", value=False, key='use_cprofile',
+    help="Liste les fonctions les plus coûteuses de l'exécution ; ralentit sensiblement l'analyse."
+)
+clear_active_profiler()
+performance_profiler = StageProfiler(cprofile=use_cprofile) if show_performance else None
+if performance_profiler is not None:
+    logging.getLogger('sentiment_analyzer.profiling').setLevel(logging.INFO)
+    performance_profiler.start()
+
 # --- Data Loading ---
-if 'df_global' not in st.session_state:
-    df_loaded, error_msg = load_data()
+# The session only holds a handle on the columnar dataset (rows are read on filtering),
+# or in streaming mode a view of the shared preview; the streaming analysis reads the
+# file by chunks. Both are reopened when the mode or the file changes.
+data_file_mtime = get_file_mtime(DATA_FILE)
+if (st.session_state.get('tweet_source_streaming'), st.session_state.get('tweet_source_mtime')) != (streaming_mode, data_file_mtime):
+    st.session_state.pop('tweet_source', None)
+    preview_handle = st.session_state.get('shared_handles', {}).pop('preview', None)
+    if preview_handle is not None: preview_handle.release()
+    st.session_state.tweet_source_streaming = streaming_mode
+    st.session_state.tweet_source_mtime = data_file_mtime
+if 'tweet_source' not in st.session_state:
+    if streaming_mode:
+        source_loaded, error_msg = get_shared_result('preview', [], lambda: load_data(DATA_FILE, nrows=STREAMING_PREVIEW_ROWS), language='')
+    else:
+        with profiled_stage('get_tweet_dataset'):
+            source_loaded, error_msg = get_tweet_dataset(DATA_FILE, data_file_mtime)
     if error_msg:
         st.error(error_msg)
-        st.session_state.df_global = pd.DataFrame()
+        st.session_state.tweet_source = pd.DataFrame()
         st.session_state.data_load_error = True
     else:
-        st.session_state.df_global = df_loaded
+        st.session_state.tweet_source = source_loaded
         st.session_state.data_load_error = False
 
 if 'keyword_select' not in st.session_state:
@@ -55,7 +465,7 @@ if menu_id == "Scrape Data From Twitter":
     st.header("Récupérer les données de Twitter (Filtrage)")
     if st.session_state.data_load_error:
         st.warning("Impossible d'afficher cette page car les données initiales n'ont pas pu être chargées.")
-    elif st.session_state.df_global.empty:
+    elif st.session_state.tweet_source.empty:
         st.warning("Le fichier de données est vide. Aucune donnée à explorer.")
     else:
         st.session_state.keyword_select = st.multiselect(
@@ -66,10 +476,11 @@ if menu_id == "Scrape Data From Twitter":
         )
         selected_keywords = st.session_state.keyword_select
         if selected_keywords:
+            if streaming_mode:
+                st.info(f"Mode streaming : aperçu limité aux {STREAMING_PREVIEW_ROWS} premières lignes du fichier.")
             with st.spinner("Filtrage des données..."):
-                df_filtered_display = filter_data_by_keywords_and_language(
-                    st.session_state.df_global, selected_keywords
-                )
+                df_filtered_display = get_shared_result('filtered:preview' if streaming_mode else 'filtered', selected_keywords,
+                                                        lambda: filter_tweets(st.session_state.tweet_source, selected_keywords))
             if not df_filtered_display.empty:
                 st.write(df_filtered_display)
                 st.success(f"{len(df_filtered_display)} tweets se chargent avec succès !")
@@ -82,96 +493,70 @@ elif menu_id == "Sentiment Analysis":
     st.header("Analyse des Sentiments")
     if st.session_state.data_load_error:
         st.warning("Impossible de procéder car les données initiales n'ont pas pu être chargées.")
-    elif st.session_state.df_global.empty:
+    elif st.session_state.tweet_source.empty:
         st.warning("Le fichier de données est vide. Aucune analyse possible.")
     else:
         selected_keywords = st.session_state.get('keyword_select', [])
         if not selected_keywords:
             st.warning("Veuillez d'abord sélectionner des mots-clés dans la section 'Récupérer les données de Twitter'.")
+        elif streaming_mode:
+            with st.spinner("Analyse en streaming du fichier..."):
+                aggregates, error_msg = run_streaming_analysis(DATA_FILE, tuple(selected_keywords), 'en', get_file_mtime(DATA_FILE), scoring_workers, score_cache_path, scoring_engine)
+            if error_msg:
+                st.error(error_msg)
+            elif aggregates['rows_analyzed'] == 0:
+                st.warning("Aucune donnée disponible pour les mots-clés sélectionnés après filtrage.")
+            else:
+                st.info(f"Mode streaming : {aggregates['rows_analyzed']} tweets uniques correspondant à '{', '.join(selected_keywords)}' analysés sur {aggregates['rows_read']} lignes lues.")
+                render_score_cache_stats(score_cache_path)
+                render_aggregate_dashboard(selected_keywords, aggregates)
+                with st.expander('Exporter les tweets analysés'):
+                    # Re-reads and re-analyzes the file chunk by chunk (scores come from the cache).
+                    render_export_controls(analysis_key('export:streaming', get_dataset_fingerprint(DATA_FILE), selected_keywords, engine=scoring_engine), lambda: (
+                        df for _, df in iter_analyzed_chunks(DATA_FILE, selected_keywords, 'en', n_workers=scoring_workers, cache_path=score_cache_path, engine=scoring_engine)))
+        elif analysis_mode == 'incremental':
+            with st.spinner("Analyse des nouveaux tweets..."), profiled_stage('run_incremental_analysis'):
+                incremental_store, refresh_summary, error_msg = run_incremental_analysis(DATA_FILE, selected_keywords, 'en', scoring_workers, score_cache_path, engine=scoring_engine)
+            if error_msg:
+                st.error(error_msg)
+            elif incremental_store.aggregates['rows_analyzed'] == 0:
+                st.warning("Aucune donnée disponible pour les mots-clés sélectionnés après filtrage.")
+            else:
+                st.info(f"Mode incrémental : {refresh_summary['rows_analyzed']} nouveaux tweets analysés sur {refresh_summary['rows_read']} nouvelles lignes ; {incremental_store.aggregates['rows_analyzed']} tweets uniques correspondant à '{', '.join(selected_keywords)}' au total.")
+                render_score_cache_stats(score_cache_path)
+                render_aggregate_dashboard(selected_keywords, incremental_store.aggregates)
+                with st.expander('Exporter les tweets analysés'):
+                    export_key = (analysis_key('export:incremental', get_dataset_fingerprint(DATA_FILE), selected_keywords, engine=scoring_engine), incremental_store.state['byte_offset'])
+                    render_export_controls(export_key, incremental_store.iter_results)
         else:
             with st.spinner("Filtrage des données pour l'analyse..."):
-                df_for_analysis_initial = filter_data_by_keywords_and_language(
-                    st.session_state.df_global, selected_keywords
-                )
+                df_for_analysis_initial = get_shared_result('filtered', selected_keywords, lambda: filter_tweets(st.session_state.tweet_source, selected_keywords))
 
             if not df_for_analysis_initial.empty:
                 st.info(f"Analyse des sentiments pour {len(df_for_analysis_initial)} tweets correspondant à '{', '.join(selected_keywords)}'.")
-                df = df_for_analysis_initial.copy() 
+                filtered_key = shared_result_key('filtered', selected_keywords)
 
                 st.subheader('Pré-traitement des données textuelles')
-                with st.spinner("Traitement du texte en cours...."):
-                    with st.expander('plus de détails'):
-                        # Step 1: Deduplicate and Lowercase
-                        st.subheader('Supprimer les fichiers en double et convertir tous les :blue[tweets] en minuscules :')
-                        df = step_deduplicate_and_lowercase(df)
-                        if 'clean_tweet' in df.columns: st.table(df[['Text', 'clean_tweet']].head(5).reset_index(drop=True))
-
-                        # Step 2: Remove URLs
-                        st.subheader("Suppression de l'URL des :blue[tweets]")
-                        df = step_remove_urls(df)
-                        if 'clean_tweet' in df.columns: st.table(df[['Text', 'clean_tweet']].head(5).reset_index(drop=True))
-
-                        # Step 3: Remove Mentions
-                        st.subheader('Suppression des identifiants Twitter (@user)')
-                        df = step_remove_mentions(df)
-                        if 'clean_tweet' in df.columns: st.table(df[['Text', 'clean_tweet']].head(5).reset_index(drop=True))
-
-                        # Step 4: Remove Hashtag Words
-                        st.subheader('Suppression des identifiants :blue[Twitter] (#hashtag)')
-                        df = step_remove_hashtags_words(df)
-                        if 'clean_tweet' in df.columns: st.table(df[['Text', 'clean_tweet']].head(3).reset_index(drop=True))
-
-                        # Step 5: Remove Ticker Words
-                        st.subheader('Suppression des identifiants :blue[Twitter] ($tickers)')
-                        df = step_remove_tickers_words(df)
-                        if 'clean_tweet' in df.columns: st.table(df[['Text', 'clean_tweet']].head(3).reset_index(drop=True))
-
-                        # Step 6: Remove Punctuation, Numbers, Special Chars
-                        st.subheader('Suppression de la ponctuation (!,?,..), des chiffres et des caractères spéciaux')
-                        df = step_remove_punctuation_numbers_special(df)
-                        if 'clean_tweet' in df.columns: st.table(df[['Text', 'clean_tweet']].head(3).reset_index(drop=True))
-
-                        # Step 7: Tokenization (display part)
-                        st.subheader('Tokénisation des :blue[tweets]: ')
-                        df_display_tokens = df[['Text', 'clean_tweet']].copy() # Use current state of clean_tweet
-                        if 'clean_tweet' in df_display_tokens.columns:
-                            df_display_tokens['clean_tweet_display'] = df_display_tokens['clean_tweet'].str.split()
-                            st.table(df_display_tokens[['Text', 'clean_tweet_display']].head(2).reset_index(drop=True))
-                        df = step_tokenize_tweets(df) 
-
-                        # Step 8: Remove Short Words (display part)
-                        st.subheader('Suppression des mots courts : ')
-                        df_display_short_words = df[['Text']].copy() 
-                        if 'clean_tweet_tokens' in df.columns:
-                            temp_tokens_for_display = df['clean_tweet_tokens'].copy()
-                            def filter_short_words_pandas(token_list):
-                                return [word for word in token_list if len(word) >= 2] if isinstance(token_list, list) else []
-                            df_display_short_words['clean_tweet_display'] = temp_tokens_for_display.apply(filter_short_words_pandas)
-                            st.table(df_display_short_words[['Text', 'clean_tweet_display']].head(2).reset_index(drop=True))
-                        df = step_remove_short_words_from_tokens(df) 
-
-                        # Step 9: Rejoin Tokens
-                        st.subheader('Recoller les jetons ensemble ')
-                        df = step_rejoin_tokens(df)
-                        if 'clean_tweet' in df.columns: st.table(df[['Text', 'clean_tweet']].head(2).reset_index(drop=True))
-                        
-                        # Final cleanup of token column if it exists
-                        if 'clean_tweet_tokens' in df.columns:
-                            df = df.drop(columns=['clean_tweet_tokens'])
-
-                # This is the fully preprocessed DataFrame now
-                df_processed_for_sentiment = df 
+                cleaning_expander = st.expander('plus de détails', key='cleaning_preview', on_change='rerun')
+                with cleaning_expander:
+                    if cleaning_expander.open:
+                        with st.spinner("Traitement du texte en cours...."):
+                            render_cleaning_preview(get_cleaning_previews(df_for_analysis_initial, filtered_key, CLEANING_PREVIEW_ROWS))
 
                 st.subheader('Comparaison entre les tweets avant et après le nettoyage')
-                with st.expander('plus de détails'):
-                    if 'Text' in df_for_analysis_initial.columns and 'clean_tweet' in df_processed_for_sentiment.columns:
-                        st.table(df_processed_for_sentiment[['Text', 'clean_tweet']].head(5).reset_index(drop=True))
+                comparison_expander = st.expander('plus de détails', key='cleaning_comparison', on_change='rerun')
+                with comparison_expander:
+                    if comparison_expander.open:
+                        st.table(get_cleaning_previews(df_for_analysis_initial, filtered_key, CLEANING_PREVIEW_ROWS)[-1].head(5))
 
                 # --- Sentiment Analysis Execution ---
                 st.subheader('Tweets après Analyse')
                 df_analyzed = pd.DataFrame()
                 with st.spinner("Analyse des sentiments en cours..."):
-                     df_analyzed = analyze_sentiment_vader(df_processed_for_sentiment)
+                     df_analyzed = get_shared_result('analyzed', selected_keywords, lambda: score_sentiment(
+                         clean_tweets(df_for_analysis_initial), n_workers=scoring_workers, cache_path=score_cache_path, engine=scoring_engine), engine=scoring_engine)
+                analyzed_key = shared_result_key('analyzed', selected_keywords, engine=scoring_engine)
+                render_score_cache_stats(score_cache_path)
 
                 with st.expander('plus de détails sur les tweets analysés'):
                     if not df_analyzed.empty and 'Sentiment' in df_analyzed.columns:
@@ -181,79 +566,63 @@ elif menu_id == "Sentiment Analysis":
                             if col in df_analyzed.columns: cols_to_display.append(col)
                         existing_cols_display = [col for col in cols_to_display if col in df_analyzed.columns]
                         st.dataframe(df_analyzed[existing_cols_display])
-                        cols_to_csv = ['clean_tweet', 'Sentiment', 'Compound_Score']
-                        existing_cols_csv = [col for col in cols_to_csv if col in df_analyzed.columns]
-                        if existing_cols_csv:
-                            csv_data = df_analyzed[existing_cols_csv].to_csv(index=False).encode('utf-8')
-                            st.download_button(label='Télécharger CSV Analysé', data=csv_data, file_name='sentiments_data.csv', mime='text/csv')
+                        render_export_controls(shared_result_key('export:memory', selected_keywords, engine=scoring_engine),
+                                               lambda: iter_frame_chunks(df_analyzed), df_analyzed.columns)
                     else:
                         st.write("Aucun résultat d'analyse à afficher.")
 
                 # --- Visualization --- 
-                st.write('------------------------------')
-                title_col1, title_col2, title_col3 = st.columns((1, 8, 2))
-                with title_col2:
-                    st.title(f'Analyse des Sentiments Twitter sur :green[{" & ".join(selected_keywords)}]')
-                with title_col3:
-                    try:
-                        st.image('image.png', width=100)
-                    except FileNotFoundError:
-                        st.caption("image.png non trouvée")
-                st.write('------------------------------')
+                render_results_header(selected_keywords)
 
                 if not df_analyzed.empty and 'Sentiment' in df_analyzed.columns:
-                    sentiment_counts = df_analyzed['Sentiment'].value_counts()
-                    total_analyzed_count = sentiment_counts.sum()
-                    stat_col1, stat_col2, stat_col3, stat_col4 = st.columns(4)
-                    if total_analyzed_count > 0:
-                        pos_perc = (sentiment_counts.get('Positive', 0) / total_analyzed_count) * 100
-                        neg_perc = (sentiment_counts.get('Negative', 0) / total_analyzed_count) * 100
-                        neu_perc = (sentiment_counts.get('Neutral', 0) / total_analyzed_count) * 100
-                        stat_col1.subheader(f"Positif (%): {pos_perc:.2f}%")
-                        stat_col2.subheader(f"Négatif (%): {neg_perc:.2f}%")
-                        stat_col3.subheader(f"Neutre (%): {neu_perc:.2f}%")
-                    else:
-                        stat_col1.subheader(f"Positif (%): N/A")
-                        stat_col2.subheader(f"Négatif (%): N/A")
-                        stat_col3.subheader(f"Neutre (%): N/A")
-                    stat_col4.subheader(f"Total Tweets: {len(df_analyzed)}")
-                    st.write('------------------------------')
+                    with profiled_stage('get_dashboard_aggregates', len(df_analyzed)):
+                        aggregates = get_dashboard_aggregates(df_analyzed, analyzed_key)
+                    sentiment_counts = sentiment_counts_from_aggregates(aggregates)
+                    render_sentiment_stats(sentiment_counts, len(df_analyzed))
                     st.subheader('Visualisation du Résultat')
                     with st.spinner("Génération des graphiques...."):
                         if not sentiment_counts.empty:
-                            df_grouped_for_charts = pd.DataFrame({'Sentiment': sentiment_counts.index, 'Count': sentiment_counts.values})
-                            chart_row1_col1, chart_row1_col2 = st.columns(2)
-                            with chart_row1_col1:
-                                fig_hist = px.histogram(df_grouped_for_charts, x='Sentiment', y='Count', color='Sentiment', title="Distribution des Sentiments (Histogramme)", color_discrete_map={'Positive':'green', 'Negative':'red', 'Neutral':'grey'})
-                                st.plotly_chart(fig_hist, use_container_width=True)
-                            with chart_row1_col2:
-                                fig_pie = px.pie(df_grouped_for_charts, values='Count', names='Sentiment', title='Répartition des Sentiments (Circulaire)', color='Sentiment', color_discrete_map={'Positive':'green', 'Negative':'red', 'Neutral':'grey'})
-                                st.plotly_chart(fig_pie, use_container_width=True)
+                            render_sentiment_distribution(sentiment_counts)
                             chart_row2_col1, chart_row2_col2 = st.columns(2) 
-                            with chart_row2_col1: # Scatter plot
+                            with chart_row2_col1: # Scatter plot (or density / sample above the threshold)
                                 if 'LikeCount' in df_analyzed.columns and 'Compound_Score' in df_analyzed.columns and pd.api.types.is_numeric_dtype(df_analyzed['LikeCount']):
-                                    fig_scatter = px.scatter(df_analyzed, x='LikeCount', y='Compound_Score', color='Sentiment', title='Likes vs. Score de Polarité', labels={'LikeCount': 'Nombre de Likes', 'Compound_Score': 'Score de Polarité'}, hover_data=['Text'], color_discrete_map={'Positive':'green', 'Negative':'red', 'Neutral':'grey'})
-                                    st.plotly_chart(fig_scatter, use_container_width=True)
+                                    scatter_points = get_scatter_points(df_analyzed, analyzed_key, scatter_max_points, scatter_mode)
+                                    render_likes_vs_score(aggregates, scatter_points, len(df_analyzed))
                                 else: st.caption("Graphique Likes vs Score non généré.")
                             with chart_row2_col2: # Line chart
-                                if 'Datetime' in df_analyzed.columns and 'Sentiment' in df_analyzed.columns:
-                                    try:
-                                        df_analyzed['Datetime'] = pd.to_datetime(df_analyzed['Datetime'], errors='coerce')
-                                        df_analyzed.dropna(subset=['Datetime'], inplace=True)
-                                        if not df_analyzed.empty:
-                                            df_analyzed['Date'] = df_analyzed['Datetime'].dt.date
-                                            sentiment_over_time = df_analyzed.groupby(['Date', 'Sentiment']).size().reset_index(name='Count')
-                                            if not sentiment_over_time.empty:
-                                                fig_line = px.line(sentiment_over_time, x='Date', y='Count', color='Sentiment', title='Tendance des Sentiments au Fil du Temps', color_discrete_map={'Positive':'green', 'Negative':'red', 'Neutral':'grey'})
-                                                st.plotly_chart(fig_line, use_container_width=True)
-                                            else: st.caption("Tendance non générée: Pas de données groupées.")
-                                        else: st.caption("Tendance non générée: Pas de dates valides.")
-                                    except Exception as e: st.warning(f"Tendance non générée: Erreur Datetime - {e}")
+                                if 'Datetime' in df_analyzed.columns:
+                                    render_sentiment_trend(aggregates)
                                 else: st.caption("Tendance non générée: Colonnes manquantes.")
                         else: st.info("Aucune donnée de sentiment à visualiser.")
                 else: st.warning("L'analyse n'a produit aucun résultat pertinent.")
             else: st.warning("Aucune donnée disponible pour les mots-clés sélectionnés après filtrage.")
 
+elif menu_id == "Batch Jobs":
+    st.header("Analyses en arrière-plan")
+    st.caption("Chaque couple (fichier, jeu de mots-clés) est analysé en arrière-plan, sans bloquer l'application ; "
+               "une analyse identique déjà en cours ou terminée n'est pas relancée, et les résultats sont conservés sur disque.")
+    with st.form('job_form'):
+        job_inputs = st.multiselect("Fichiers CSV", list_job_inputs(), default=[DATA_FILE] if os.path.exists(DATA_FILE) else [])
+        keyword_text = st.text_area("Jeux de mots-clés (un par ligne, mots-clés séparés par des virgules)", value=', '.join(st.session_state.keyword_select))
+        job_language = st.text_input("Langue", value='en')
+        submitted = st.form_submit_button("Lancer les analyses")
+    if submitted:
+        keyword_sets = parse_keyword_sets(keyword_text)
+        if not job_inputs or not keyword_sets:
+            st.warning("Veuillez sélectionner au moins un fichier et un jeu de mots-clés.")
+        else:
+            try:
+                job_ids = get_job_scheduler().submit(job_inputs, keyword_sets, job_language.strip() or 'en', engine=scoring_engine, cache_path=score_cache_path)
+                st.success(f"{len(job_ids)} analyse(s) soumise(s).")
+            except (OSError, BrokenProcessPool) as e:
+                st.error(f"Error: {e}")
+    render_jobs_progress()
+    render_finished_jobs()
+
+if performance_profiler is not None:
+    performance_profiler.stop()
+    render_performance_panel(performance_profiler)
+
 # Footer
 st.markdown("---")
 st.markdown("<p style='text-align: center; color: grey;'>Sentiment Analyzer © 2024</p>", unsafe_allow_html=True)
\ No newline at end of file
@@ -0,0 +1,157 @@
+# batch.py
+# Headless batch pipeline (no Streamlit): load -> filter -> clean -> score -> write.
+# Usage:
+#   python -m batch chatgpt1.csv -k "#ChatGPT" -k "#AI" -o results/ --format parquet
+#   python -m batch dumps/*.csv -k "#ChatGPT" --jobs 4
+# For each input, writes <name>.sentiment.<csv|csv.gz|parquet> (analyzed rows) and
+# <name>.aggregates.json (sentiment/date/score aggregates, row counts, timings).
+# With --profile, per-stage timings are added to the summary ("profile") and logged,
+# and --cprofile also lists the hot functions of each job.
+import time
+_START = time.perf_counter()
+
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from caching import set_cache_backend
+from export import ResultWriter, OUTPUT_FORMATS
+from profiling import StageProfiler
+from processing import (
+    iter_analyzed_chunks,
+    new_sentiment_aggregates,
+    update_sentiment_aggregates,
+    shutdown_scoring_pools,
+    SCORE_CACHE_PATH,
+    SCORING_ENGINES,
+)
+
+IMPORT_SECONDS = time.perf_counter() - _START
+
+def output_paths(input_path, output_dir, output_format):
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return (os.path.join(output_dir, f"{stem}.sentiment.{output_format}"),
+            os.path.join(output_dir, f"{stem}.aggregates.json"))
+
+# --- Batch Job ---
+def run_batch_job(input_path, selected_keywords, language='en', output_dir='.', output_format='csv',
+                  chunksize=50_000, n_workers=1, cache_path=None, columns=None, profile=False, cprofile=False, engine='vader', progress=None):
+    # progress, if given, is called as progress(rows_read, rows_analyzed) after each chunk.
+    if profile or cprofile:
+        profiler = StageProfiler(cprofile=cprofile)
+        with profiler.activate():
+            summary = run_batch_job(input_path, selected_keywords, language, output_dir, output_format, chunksize, n_workers, cache_path, columns, engine=engine, progress=progress)
+        profiler.log_summary()
+        summary['profile'] = {**json.loads(profiler.to_json()), 'summary': profiler.summary().to_dict(orient='records')}
+        _write_summary(summary, output_paths(input_path, output_dir, output_format)[1])
+        return summary
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    results_path, aggregates_path = output_paths(input_path, output_dir, output_format)
+    aggregates = new_sentiment_aggregates()
+    writer = ResultWriter(results_path, output_format, columns)
+    try:
+        for rows_read, df_analyzed in iter_analyzed_chunks(input_path, selected_keywords, language, chunksize, n_workers, cache_path, engine):
+            aggregates['rows_read'] += rows_read
+            if not df_analyzed.empty:
+                update_sentiment_aggregates(aggregates, df_analyzed)
+                writer.write(df_analyzed)
+            if progress is not None: progress(aggregates['rows_read'], aggregates['rows_analyzed'])
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    summary = {
+        'input': input_path,
+        'keywords': list(selected_keywords),
+        'language': language,
+        'engine': engine,
+        'results': results_path,
+        'rows_read': aggregates['rows_read'],
+        'rows_analyzed': aggregates['rows_analyzed'],
+        'timings': {'import_seconds': IMPORT_SECONDS, 'job_seconds': time.perf_counter() - started},
+        'aggregates': aggregates,
+    }
+    _write_summary(summary, aggregates_path)
+    return summary
+
+def _write_summary(summary, aggregates_path):
+    tmp_path = f"{aggregates_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, default=_json_default)
+    os.replace(tmp_path, aggregates_path)
+
+def _json_default(value):
+    # Nullable integers and NaN from the profiler summary.
+    return None if pd.isna(value) else float(value)
+
+def _run_batch_job_safely(kwargs):
+    # Worker entry point for --jobs: errors are reported per file instead of aborting the batch.
+    set_cache_backend('local')
+    try:
+        return run_batch_job(**kwargs), None
+    except Exception as e:
+        return None, f"Error processing {kwargs['input_path']}: {e}"
+    finally:
+        shutdown_scoring_pools()
+
+# --- Command Line ---
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m batch', description="Analyse de sentiments VADER en lot, sans Streamlit.")
+    parser.add_argument('inputs', nargs='+', help="Fichier(s) CSV de tweets.")
+    parser.add_argument('-k', '--keyword', dest='keywords', action='append', required=True, help="Mot-clé à rechercher dans la colonne hashtag (répétable).")
+    parser.add_argument('-l', '--language', default='en', help="Langue des tweets à conserver (défaut : en).")
+    parser.add_argument('-o', '--output-dir', default='.', help="Dossier de sortie (défaut : dossier courant).")
+    parser.add_argument('-f', '--format', dest='output_format', choices=OUTPUT_FORMATS, default='csv', help="Format des résultats (défaut : csv).")
+    parser.add_argument('--columns', help="Colonnes à écrire, séparées par des virgules (défaut : toutes).")
+    parser.add_argument('--chunksize', type=int, default=50_000, help="Lignes lues par morceau (défaut : 50000).")
+    parser.add_argument('-e', '--engine', choices=SCORING_ENGINES, default='vader', help="Moteur de scoring : VADER texte par texte ou vectorisé NumPy (mêmes scores, beaucoup plus rapide) (défaut : vader).")
+    parser.add_argument('-w', '--workers', type=int, default=1, help="Processus de scoring VADER par fichier ; 0 = tous les cœurs (défaut : 1).")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="Fichiers traités en parallèle (défaut : 1).")
+    parser.add_argument('--score-cache', default=SCORE_CACHE_PATH, help=f"Cache SQLite des scores (défaut : {SCORE_CACHE_PATH}).")
+    parser.add_argument('--no-score-cache', action='store_true', help="Désactive le cache persistant des scores.")
+    parser.add_argument('--profile', action='store_true', help="Mesure chaque étape (temps, lignes, mémoire) et l'ajoute au résumé.")
+    parser.add_argument('--cprofile', action='store_true', help="Comme --profile, avec la liste des fonctions les plus coûteuses (cProfile).")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    set_cache_backend('local')
+    if args.profile or args.cprofile:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+    job_kwargs = [{
+        'input_path': input_path,
+        'selected_keywords': args.keywords,
+        'language': args.language,
+        'output_dir': args.output_dir,
+        'output_format': args.output_format,
+        'chunksize': args.chunksize,
+        'n_workers': args.workers,
+        'cache_path': None if args.no_score_cache else args.score_cache,
+        'columns': args.columns.split(',') if args.columns else None,
+        'profile': args.profile,
+        'cprofile': args.cprofile,
+        'engine': args.engine,
+    } for input_path in args.inputs]
+    if args.jobs > 1 and len(job_kwargs) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            outcomes = list(executor.map(_run_batch_job_safely, job_kwargs))
+    else:
+        outcomes = [_run_batch_job_safely(kwargs) for kwargs in job_kwargs]
+    failed = 0
+    for summary, error_msg in outcomes:
+        if error_msg:
+            failed += 1
+            print(error_msg, file=sys.stderr)
+        else:
+            print(json.dumps({key: summary[key] for key in ('input', 'results', 'rows_read', 'rows_analyzed', 'timings')}))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,331 @@
+# benchmark.py
+# Reproducible, offline benchmark of the pipeline stages on a synthetic tweet corpus.
+# Usage:
+#   python benchmark.py --sizes 10000 100000 --output bench.json
+#   python benchmark.py --sizes 1000000 --stages load_data filter clean_tweets --no-memory
+#   python benchmark.py --compare bench-before.json bench-after.json
+# Requires the NLTK VADER lexicon to be installed locally for the scoring stage.
+import argparse
+import ctypes
+import ctypes.util
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pyarrow as pa
+
+from caching import set_cache_backend
+from profiling import current_rss_bytes
+from processing import (
+    load_data,
+    filter_data_by_keywords_and_language,
+    step_deduplicate_and_lowercase,
+    step_remove_urls,
+    step_remove_mentions,
+    step_remove_hashtags_words,
+    step_remove_tickers_words,
+    step_remove_punctuation_numbers_special,
+    step_tokenize_tweets,
+    step_remove_short_words_from_tokens,
+    step_rejoin_tokens,
+    clean_tweets,
+    analyze_sentiment_vader,
+    new_sentiment_aggregates,
+    update_sentiment_aggregates,
+    sentiment_over_time_from_aggregates,
+)
+
+CLEANING_STEP_CHAIN = [
+    step_deduplicate_and_lowercase,
+    step_remove_urls,
+    step_remove_mentions,
+    step_remove_hashtags_words,
+    step_remove_tickers_words,
+    step_remove_punctuation_numbers_special,
+    step_tokenize_tweets,
+    step_remove_short_words_from_tokens,
+    step_rejoin_tokens,
+]
+BENCHMARK_KEYWORDS = ['#ChatGPT', '#AI']
+
+# --- Synthetic Corpus ---
+_VOCABULARY = {
+    'en': ['chatgpt', 'is', 'amazing', 'terrible', 'I', 'love', 'hate', 'the', 'new', 'AI', 'model', 'a', 'good', 'bad',
+           'really', 'not', 'great', 'awful', 'helpful', 'wrong', 'answer', 'my', 'homework', 'future', 'scary', 'cool',
+           'today', 'wow', 'never', 'best', 'worst', 'ever', 'so', 'very', 'kind', 'of', 'but', 'useful', 'boring'],
+    'fr': ['chatgpt', 'est', 'incroyable', 'nul', 'je', 'adore', 'déteste', 'le', 'nouveau', 'modèle', 'très', 'pas', 'bien'],
+    'es': ['chatgpt', 'es', 'increíble', 'malo', 'me', 'encanta', 'odio', 'el', 'nuevo', 'modelo', 'muy', 'no', 'bueno'],
+    'de': ['chatgpt', 'ist', 'toll', 'schlecht', 'ich', 'liebe', 'hasse', 'das', 'neue', 'Modell', 'sehr', 'nicht', 'gut'],
+}
+LANGUAGE_WEIGHTS = {'en': 0.7, 'fr': 0.1, 'es': 0.1, 'de': 0.1}
+_HASHTAGS = ['#ChatGPT', '#chatGpt', '#AI', '#GenerativeAI', '#OpenAI', '#MachineLearning', '#tech']
+_MENTIONS = ['@OpenAI', '@sama', '@elonmusk', '@user_123', '@techcrunch']
+_TICKERS = ['$MSFT', '$GOOG', '$NVDA', '$AMZN']
+_DECORATIONS = ['!', '!!', '?', '...', ':)', ':(', '😂', '🔥', '2023', '100%', '&amp;', '-']
+CORPUS_START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+# One tweet in ten is dated in another UTC offset, as in exports mixing time zones.
+_OTHER_OFFSET = timezone(timedelta(hours=2))
+
+def _generate_text(rng, language):
+    words = rng.choices(_VOCABULARY[language], k=rng.randint(5, 30))
+    if language == 'en' and rng.random() < 0.3:
+        words = [word.upper() if rng.random() < 0.2 else word for word in words]
+    extras = [rng.choice(_HASHTAGS) for _ in range(rng.randint(0, 3))]
+    extras += [rng.choice(_MENTIONS) for _ in range(rng.choices([0, 1, 2], [0.5, 0.35, 0.15])[0])]
+    extras += [rng.choice(_TICKERS)] if rng.random() < 0.05 else []
+    extras += [f"https://t.co/{rng.getrandbits(40):010x}"] if rng.random() < 0.4 else []
+    extras += rng.choices(_DECORATIONS, k=rng.randint(0, 3))
+    for extra in extras:
+        words.insert(rng.randint(0, len(words)), extra)
+    return ' '.join(words), [word for word in extras if word.startswith('#')]
+
+def generate_corpus(n_rows, seed=0, duplicate_rate=0.2, days=30, start_row=0):
+    # Tweets with URLs, mentions, hashtags, tickers, emojis, several languages, a share
+    # of exact duplicates and retweets ("RT @user: <text>"), and datetimes over `days`
+    # (with mixed UTC offsets).
+    rng = random.Random(f"{seed}-{start_row}")
+    languages, weights = list(LANGUAGE_WEIGHTS), list(LANGUAGE_WEIGHTS.values())
+    rows = []
+    for i in range(n_rows):
+        if rows and rng.random() < duplicate_rate:
+            original = rows[rng.randrange(len(rows))]
+            text = original['Text'] if rng.random() < 0.5 else f"RT {rng.choice(_MENTIONS)}: {original['Text']}"
+            language, hashtags = original['Language'], original['hashtag']
+        else:
+            language = rng.choices(languages, weights)[0]
+            text, tags = _generate_text(rng, language)
+            hashtags = str(tags) if tags else None
+        rows.append({
+            'Datetime': (CORPUS_START + timedelta(seconds=rng.randrange(days * 86400))).astimezone(
+                _OTHER_OFFSET if (start_row + i) % 10 == 9 else timezone.utc).isoformat(sep=' '),
+            'TweetId': start_row + i,
+            'Text': text,
+            'Username': f"user{rng.randrange(max(n_rows // 10, 1))}",
+            'LikeCount': int(rng.paretovariate(1.5)) - 1,
+            'Language': language,
+            'hashtag': hashtags,
+        })
+    return pd.DataFrame(rows)
+
+def write_corpus(path, n_rows, seed=0, chunk_rows=100_000, **corpus_kwargs):
+    # Generated and written chunk by chunk, so 10M-row corpora need little memory.
+    for start_row in range(0, n_rows, chunk_rows):
+        chunk = generate_corpus(min(chunk_rows, n_rows - start_row), seed, start_row=start_row, **corpus_kwargs)
+        chunk.to_csv(path, mode='w' if start_row == 0 else 'a', header=start_row == 0, index=False)
+    return path
+
+# --- Stage Measurement ---
+def run_step_chain(df):
+    for step in CLEANING_STEP_CHAIN:
+        df = step(df)
+    return df.drop(columns=['clean_tweet_tokens'])
+
+# Memory figures of each stage record:
+#   peak_rss_delta_bytes  peak resident memory of the process during the timed run, minus
+#                         the resident memory before it: every allocation, including the
+#                         Arrow buffers of pyarrow-backed string columns (Linux only).
+#                         Memory cached by the Arrow pool and by malloc is returned to the
+#                         system first, so that earlier stages' freed memory is not reused
+#                         uncounted.
+#   peak_traced_bytes     peak of the Python objects and NumPy buffers seen by tracemalloc
+#                         in a second, traced run (Arrow buffers are not seen)
+MEMORY_FIELDS = ('peak_rss_delta_bytes', 'peak_traced_bytes')
+
+def _release_cached_memory():
+    gc.collect()
+    pa.default_memory_pool().release_unused()
+    try:
+        ctypes.CDLL(ctypes.util.find_library('c')).malloc_trim(0)  # glibc only
+    except (OSError, AttributeError, TypeError):
+        pass
+
+def _reset_peak_rss():
+    # Resets the process's peak resident memory (VmHWM) to its current value (Linux >= 4.0).
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_bytes():
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'): return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def measure_stage(func, stage_input, measure_memory=True):
+    # Returns (output, wall seconds, {memory field: bytes or None}); see MEMORY_FIELDS.
+    memory = dict.fromkeys(MEMORY_FIELDS)
+    if measure_memory:
+        _release_cached_memory()
+        rss_before = current_rss_bytes()
+        peak_reset = _reset_peak_rss()
+    start = time.perf_counter()
+    output = func(stage_input)
+    seconds = time.perf_counter() - start
+    if measure_memory:
+        peak_rss = _peak_rss_bytes() if peak_reset else None
+        if peak_rss is not None and rss_before is not None:
+            memory['peak_rss_delta_bytes'] = max(peak_rss - rss_before, 0)
+        tracemalloc.start()
+        func(stage_input)
+        memory['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return output, seconds, memory
+
+def benchmark_pipeline(csv_path, stages=None, measure_memory=True, keywords=BENCHMARK_KEYWORDS):
+    # Runs load -> filter -> each cleaning step -> fused cleaning -> scoring, feeding each
+    # stage the previous stage's output. Stages that are not selected only run when a
+    # selected stage needs their output. Returns one record per selected stage.
+    pipeline = [('load_data', lambda path: load_data(path)[0], None)]
+    pipeline.append(('filter', lambda df: filter_data_by_keywords_and_language(df, keywords), 'load_data'))
+    previous = 'filter'
+    for step in CLEANING_STEP_CHAIN:
+        pipeline.append((step.__name__, step, previous))
+        previous = step.__name__
+    pipeline.append(('clean_tweets', clean_tweets, 'filter'))
+    pipeline.append(('analyze_sentiment_vader', analyze_sentiment_vader, 'clean_tweets'))
+    pipeline.append(('analyze_sentiment_vader[vectorized]', lambda df: analyze_sentiment_vader(df, engine='vectorized'), 'clean_tweets'))
+    # Dashboard rollups and the hourly trend built from them (one output row per bucket).
+    pipeline.append(('sentiment_aggregates', lambda df: sentiment_over_time_from_aggregates(
+        update_sentiment_aggregates(new_sentiment_aggregates(), df), 'h'), 'analyze_sentiment_vader[vectorized]'))
+    inputs = {name: input_name for name, _, input_name in pipeline}
+    selected = set(inputs) if stages is None else set(stages)
+    unknown = selected - set(inputs)
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+    required = set()
+    for name in selected:
+        while name is not None and name not in required:
+            required.add(name)
+            name = inputs[name]
+    outputs = {}
+    records = []
+    for name, func, input_name in pipeline:
+        if name not in required: continue
+        stage_input = csv_path if input_name is None else outputs[input_name]
+        output, seconds, memory = measure_stage(func, stage_input, measure_memory and name in selected)
+        outputs[name] = output
+        if name not in selected: continue
+        rows_in = len(output) if input_name is None else len(stage_input)
+        records.append({
+            'stage': name,
+            'rows_in': rows_in,
+            'rows_out': len(output),
+            'seconds': seconds,
+            'rows_per_sec': rows_in / seconds if seconds else None,
+            **memory,
+        })
+    return records
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(sizes, seed=0, stages=None, measure_memory=True, work_dir=None):
+    set_cache_backend('none')
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': seed,
+            'memory_fields': {
+                'peak_rss_delta_bytes': "peak resident memory during the stage minus resident memory before it (all allocations, Arrow included; Linux only)",
+                'peak_traced_bytes': "tracemalloc peak: Python objects and NumPy buffers only, Arrow buffers excluded",
+            },
+        },
+        'results': [],
+    }
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        for n_rows in sizes:
+            csv_path = write_corpus(os.path.join(tmp_dir, f"corpus-{n_rows}.csv"), n_rows, seed)
+            for record in benchmark_pipeline(csv_path, stages, measure_memory):
+                report['results'].append({'corpus_rows': n_rows, **record})
+                print(f"{n_rows:>10} {record['stage']:<40} {record['seconds']:>9.3f}s "
+                      f"{(record['rows_per_sec'] or 0):>12,.0f} rows/s", file=sys.stderr)
+            os.remove(csv_path)
+    report['meta']['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return report
+
+def compare_reports(before, after):
+    # Lines of (corpus rows, stage, seconds before, seconds after, ratio after/before).
+    before_times = {(r['corpus_rows'], r['stage']): r['seconds'] for r in before['results']}
+    lines = []
+    for record in after['results']:
+        key = (record['corpus_rows'], record['stage'])
+        if key in before_times:
+            ratio = record['seconds'] / before_times[key] if before_times[key] else float('inf')
+            lines.append((key[0], key[1], before_times[key], record['seconds'], ratio))
+    return lines
+
+# --- Cleaning: step chain vs fused ---
+def run_cleaning_benchmark(n_rows=100_000, seed=0):
+    df = generate_corpus(n_rows, seed)
+    start = time.perf_counter()
+    chained = run_step_chain(df)
+    chain_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    fused = clean_tweets(df)
+    fused_seconds = time.perf_counter() - start
+    return {
+        'rows': n_rows,
+        'chain_seconds': chain_seconds,
+        'fused_seconds': fused_seconds,
+        'speedup': chain_seconds / fused_seconds if fused_seconds else float('inf'),
+        'identical': chained['clean_tweet'].tolist() == fused['clean_tweet'].tolist(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of the sentiment pipeline stages on a synthetic corpus.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000], help="Corpus sizes in rows.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stages', nargs='+', help="Stages to report (default: all).")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the memory measurements (peak RSS and the traced run) of each stage.")
+    parser.add_argument('--output', help="Write the JSON report to this file (default: stdout).")
+    parser.add_argument('--work-dir', help="Directory for the temporary corpus files.")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two JSON reports.")
+    parser.add_argument('--cleaning', type=int, metavar='ROWS', help="Only compare the step chain with clean_tweets.")
+    args = parser.parse_args(argv)
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f: before = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f: after = json.load(f)
+        for n_rows, stage, before_s, after_s, ratio in compare_reports(before, after):
+            print(f"{n_rows:>10} {stage:<40} {before_s:>9.3f}s -> {after_s:>9.3f}s  x{ratio:.2f}")
+        return 0
+    if args.cleaning:
+        result = run_cleaning_benchmark(args.cleaning, args.seed)
+        print(f"{result['rows']} rows: chain {result['chain_seconds']:.3f}s, fused {result['fused_seconds']:.3f}s "
+              f"({result['speedup']:.1f}x), identical output: {result['identical']}")
+        return 0
+    report = run_benchmark(args.sizes, args.seed, args.stages, not args.no_memory, args.work_dir)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f: json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# caching.py
+import functools
+import sys
+import threading
+
+# --- Pluggable Caching ---
+# processing.py decorates its functions with cache_resource / cache_data instead of
+# st.cache_resource / st.cache_data, so it can be imported without Streamlit.
+# The backend is resolved on first call:
+#   'streamlit'  st.cache_resource / st.cache_data (default once Streamlit is imported)
+#   'local'      in-process memoization of resources, no data caching (default otherwise)
+#   'none'       no caching at all
+# set_cache_backend() picks a backend by name or registers a custom
+# (resource_decorator, data_decorator) pair.
+_cache_backend = None
+_lock = threading.Lock()
+
+def _no_cache(func):
+    return func
+
+def _local_cache_resource(func):
+    return functools.lru_cache(maxsize=None)(func)
+
+def _streamlit_cache_resource(func):
+    import streamlit as st
+    return st.cache_resource(func)
+
+def _streamlit_cache_data(func):
+    import streamlit as st
+    return st.cache_data(func)
+
+CACHE_BACKENDS = {
+    'streamlit': (_streamlit_cache_resource, _streamlit_cache_data),
+    'local': (_local_cache_resource, _no_cache),
+    'none': (_no_cache, _no_cache),
+}
+
+def set_cache_backend(backend):
+    global _cache_backend
+    if isinstance(backend, str) and backend not in CACHE_BACKENDS:
+        raise ValueError(f"Unknown cache backend: {backend!r} (expected one of {', '.join(CACHE_BACKENDS)})")
+    _cache_backend = backend
+
+def get_cache_backend():
+    if _cache_backend is not None: return _cache_backend
+    return 'streamlit' if 'streamlit' in sys.modules else 'local'
+
+def _backend_decorators(backend):
+    return CACHE_BACKENDS[backend] if isinstance(backend, str) else backend
+
+def _cached(func, kind):
+    wrapped_by_backend = {}
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        backend = get_cache_backend()
+        key = backend if isinstance(backend, str) else id(backend)
+        wrapped = wrapped_by_backend.get(key)
+        if wrapped is None:
+            with _lock:
+                wrapped = wrapped_by_backend.get(key)
+                if wrapped is None:
+                    wrapped = wrapped_by_backend[key] = _backend_decorators(backend)[kind](func)
+        return wrapped(*args, **kwargs)
+    return wrapper
+
+def cache_resource(func):
+    return _cached(func, 0)
+
+def cache_data(func):
+    return _cached(func, 1)
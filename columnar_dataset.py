@@ -0,0 +1,192 @@
+# columnar_dataset.py
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# --- Columnar Dataset (Arrow IPC + precomputed filter indexes) ---
+# ingest_csv() converts each version of the CSV once into its own directory,
+# <dataset dir>/<version>/ (the version hashes the CSV fingerprint), holding:
+#   data.arrow              uncompressed Arrow IPC file, memory-mapped on read:
+#                           original columns + dictionary-encoded normalized keys
+#   <key>_offsets.npy       CSR inverted index: normalized value -> sorted row ids
+#   <key>_rows.npy
+#   meta.json               source fingerprint, columns, index values
+# Keyword/language filtering then only touches the indexes (a substring match over
+# the distinct hashtag values, a union of their row ids and an intersection with
+# the language's row ids) and takes just the matching rows from the mapped file.
+# A version is built in a temporary directory renamed into place, and never rewritten:
+# a dataset opened before the CSV changed keeps reading the version it was built from,
+# even after newer ingests prune it (its files stay mapped until it is closed).
+DATASET_FORMAT_VERSION = 2
+DATASETS_ROOT = os.path.join('.cache', 'datasets')
+INDEXED_COLUMNS = {'language_norm': 'Language', 'hashtag_norm': 'hashtag'}
+
+def csv_fingerprint(csv_path):
+    stat = os.stat(csv_path)
+    return {'path': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def dataset_dir_for(csv_path, root=DATASETS_ROOT):
+    path_hash = hashlib.blake2b(os.path.abspath(csv_path).encode('utf-8'), digest_size=6).hexdigest()
+    return os.path.join(root, f"{os.path.splitext(os.path.basename(csv_path))[0]}-{path_hash}")
+
+def version_dir_for(csv_path, root=DATASETS_ROOT, fingerprint=None):
+    fingerprint = fingerprint or csv_fingerprint(csv_path)
+    key = json.dumps([DATASET_FORMAT_VERSION, fingerprint], sort_keys=True)
+    return os.path.join(dataset_dir_for(csv_path, root), hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest())
+
+def _prune_versions(dataset_dir, keep):
+    # Older versions, and the files of the flat layout of format version 1.
+    for name in os.listdir(dataset_dir):
+        path = os.path.join(dataset_dir, name)
+        if path == keep or name.startswith('.tmp-'): continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _normalize(series):
+    # Same normalization as filter_data_by_keywords_and_language.
+    return series.astype(str).str.lower()
+
+def _build_inverted_index(normalized):
+    codes, values = pd.factorize(normalized)
+    order = np.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    counts = np.bincount(codes[codes >= 0], minlength=len(values))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return [str(value) for value in values], offsets, order.astype(np.int64)
+
+def ingest_csv(csv_path, root=DATASETS_ROOT):
+    fingerprint = csv_fingerprint(csv_path)
+    version_dir = version_dir_for(csv_path, root, fingerprint)
+    build_dir = os.path.join(os.path.dirname(version_dir), f".tmp-{os.getpid()}-{threading.get_ident()}")
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    try:
+        _write_dataset(csv_path, fingerprint, build_dir)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    if os.path.isdir(version_dir) and not _is_current(version_dir, fingerprint):
+        shutil.rmtree(version_dir, ignore_errors=True)  # left incomplete by an older build
+    try:
+        os.rename(build_dir, version_dir)
+    except OSError:
+        # Another ingest of the same version finished first: use it.
+        shutil.rmtree(build_dir, ignore_errors=True)
+        if not _is_current(version_dir, fingerprint): raise
+    _prune_versions(os.path.dirname(version_dir), keep=version_dir)
+    return ColumnarDataset(version_dir)
+
+def _write_dataset(csv_path, fingerprint, dataset_dir):
+    df = pd.read_csv(csv_path)
+    columns = [str(col) for col in df.columns]
+    index_values = {}
+    table_df = df.reset_index(drop=True)
+    for key, source in INDEXED_COLUMNS.items():
+        if source not in df.columns: continue
+        normalized = _normalize(df[source])
+        values, offsets, rows = _build_inverted_index(normalized)
+        np.save(os.path.join(dataset_dir, f"{key}_offsets.npy"), offsets)
+        np.save(os.path.join(dataset_dir, f"{key}_rows.npy"), rows)
+        index_values[key] = values
+        table_df[key] = pd.Categorical(normalized, categories=values)
+    feather.write_feather(pa.Table.from_pandas(table_df, preserve_index=False), os.path.join(dataset_dir, 'data.arrow'), compression='uncompressed')
+    meta = {
+        'format_version': DATASET_FORMAT_VERSION,
+        'source': fingerprint,
+        'num_rows': len(df),
+        'columns': columns,
+        'index_values': index_values,
+    }
+    with open(os.path.join(dataset_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+def _is_current(dataset_dir, fingerprint):
+    try:
+        with open(os.path.join(dataset_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get('format_version') == DATASET_FORMAT_VERSION and meta.get('source') == fingerprint
+
+def open_tweet_dataset(csv_path='chatgpt1.csv', root=DATASETS_ROOT):
+    # Returns (dataset, error) like load_data; ingests the CSV when it has changed.
+    try:
+        fingerprint = csv_fingerprint(csv_path)
+        version_dir = version_dir_for(csv_path, root, fingerprint)
+        if _is_current(version_dir, fingerprint):
+            return ColumnarDataset(version_dir), None
+        return ingest_csv(csv_path, root), None
+    except FileNotFoundError:
+        return None, f"Error: {csv_path} not found."
+    except Exception as e:
+        return None, f"Error loading {csv_path}: {e}"
+
+class ColumnarDataset:
+    def __init__(self, dataset_dir):
+        self.dataset_dir = dataset_dir
+        with open(os.path.join(dataset_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.num_rows = meta['num_rows']
+        self.columns = meta['columns']
+        self.source = meta['source']
+        self._index_values = meta['index_values']
+        self._indexes = {}
+        for key in self._index_values:
+            offsets = np.load(os.path.join(dataset_dir, f"{key}_offsets.npy"), mmap_mode='r')
+            rows = np.load(os.path.join(dataset_dir, f"{key}_rows.npy"), mmap_mode='r')
+            self._indexes[key] = (offsets, rows)
+        # Mapped once, so reads keep working if this version is pruned later.
+        self._table = feather.read_table(os.path.join(dataset_dir, 'data.arrow'), memory_map=True)
+
+    @property
+    def empty(self):
+        return self.num_rows == 0
+
+    def _mask_for_value_ids(self, key, value_ids):
+        offsets, rows = self._indexes[key]
+        mask = np.zeros(self.num_rows, dtype=bool)
+        for i in value_ids:
+            mask[rows[offsets[i]:offsets[i + 1]]] = True
+        return mask
+
+    def row_ids_for(self, selected_keywords, language='en'):
+        # Union of the row ids of every matching hashtag value, intersected with the
+        # language's row ids; both are set operations on boolean row masks.
+        if not selected_keywords or any(key not in self._indexes for key in INDEXED_COLUMNS):
+            return np.empty(0, dtype=np.int64)
+        pattern = '|'.join([re.escape(kw.lower()) for kw in selected_keywords])
+        hashtag_values = pd.Series(self._index_values['hashtag_norm'], dtype=object)
+        hashtag_ids = np.flatnonzero(hashtag_values.str.contains(pattern, na=False).to_numpy(dtype=bool))
+        language_ids = [i for i, value in enumerate(self._index_values['language_norm']) if value == language.lower()]
+        mask = self._mask_for_value_ids('hashtag_norm', hashtag_ids)
+        mask &= self._mask_for_value_ids('language_norm', language_ids)
+        return np.flatnonzero(mask).astype(np.int64)
+
+    def read_rows(self, row_ids, columns=None):
+        columns = list(columns) if columns is not None else self.columns
+        df = self._table.select(columns).take(pa.array(row_ids, type=pa.int64())).to_pandas()
+        df.index = pd.Index(row_ids, dtype='int64')
+        return df
+
+    def filter(self, selected_keywords, language='en', columns=None):
+        # Same rows, labels and column order as
+        # filter_data_by_keywords_and_language(load_data(csv_path)[0], ...).
+        if self.empty or not selected_keywords or any(key not in self._indexes for key in INDEXED_COLUMNS):
+            return pd.DataFrame()
+        return self.read_rows(self.row_ids_for(selected_keywords, language), columns)
+
+    def to_pandas(self, columns=None):
+        return self.read_rows(np.arange(self.num_rows, dtype=np.int64), columns)
@@ -0,0 +1,128 @@
+# export.py
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+# --- Export of Analyzed Results ---
+# Analyzed tweets are written chunk by chunk to a file, and only when an export is
+# requested, so a result set is never serialized in memory as a whole:
+#   path = export_results(source_key, lambda: iter_frame_chunks(df), 'csv.gz', columns)
+# source_key identifies the analysis result (file fingerprint, keywords, mode...): the
+# same result exported again in the same format with the same columns reuses the file
+# in EXPORT_ROOT, which keeps the EXPORT_MAX_FILES most recently used exports.
+EXPORT_ROOT = os.path.join('.cache', 'exports')
+EXPORT_MAX_FILES = 16
+EXPORT_CHUNK_ROWS = 50_000
+OUTPUT_FORMATS = ('csv', 'csv.gz', 'parquet')
+EXPORT_MIME_TYPES = {'csv': 'text/csv', 'csv.gz': 'application/gzip', 'parquet': 'application/vnd.apache.parquet'}
+EXPORT_BASE_COLUMNS = ['clean_tweet', 'Sentiment', 'Compound_Score']
+EXPORT_EXTRA_COLUMNS = ['Text', 'Username', 'LikeCount', 'Datetime', 'Language', 'hashtag']
+_export_locks = {}
+_export_locks_guard = threading.Lock()
+
+# --- Result Writers (append chunk by chunk, renamed into place when complete) ---
+class ResultWriter:
+    def __init__(self, path, output_format, columns=None):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {output_format!r}, expected one of {', '.join(OUTPUT_FORMATS)}")
+        self.path = path
+        self.output_format = output_format
+        self.columns = columns
+        self.rows_written = 0
+        self._tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._csv_file = None
+        self._parquet_writer = None
+
+    def write(self, df):
+        if self.columns is not None:
+            df = df[[col for col in self.columns if col in df.columns]]
+        if self.output_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._parquet_writer is None:
+                schema = pa.Schema.from_pandas(df, preserve_index=False)
+                # Columns that are entirely empty in the first chunk are written as strings.
+                schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema])
+                self._parquet_writer = pq.ParquetWriter(self._tmp_path, schema)
+            self._parquet_writer.write_table(pa.Table.from_pandas(df, schema=self._parquet_writer.schema, preserve_index=False))
+        else:
+            header = self._csv_file is None
+            if header: self._csv_file = self._open_csv()
+            df.to_csv(self._csv_file, header=header, index=False)
+        self.rows_written += len(df)
+
+    def _open_csv(self):
+        if self.output_format == 'csv.gz':
+            return gzip.open(self._tmp_path, 'wt', encoding='utf-8', newline='')
+        return open(self._tmp_path, 'w', encoding='utf-8', newline='')
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if self._csv_file is not None:
+            self._csv_file.close()
+        if not os.path.exists(self._tmp_path):
+            empty = pd.DataFrame(columns=self.columns or [])
+            if self.output_format == 'parquet': empty.to_parquet(self._tmp_path, index=False)
+            else:
+                with self._open_csv() as f: empty.to_csv(f, index=False)
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        # Drops the partial file, e.g. when the analysis feeding the writer fails.
+        for handle in (self._parquet_writer, self._csv_file):
+            if handle is not None: handle.close()
+        if os.path.exists(self._tmp_path): os.remove(self._tmp_path)
+
+# --- Cached Exports ---
+def iter_frame_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def export_path(source_key, output_format, columns=None, root=EXPORT_ROOT):
+    key = json.dumps([source_key, output_format, list(columns) if columns is not None else None], default=str)
+    key_hash = hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+    return os.path.join(root, f"sentiments-{key_hash}.{output_format}")
+
+def _export_lock(path):
+    with _export_locks_guard:
+        return _export_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+def export_results(source_key, chunks, output_format='csv', columns=None, root=EXPORT_ROOT):
+    # chunks() returns an iterable of analyzed DataFrames; it is only called if this
+    # export is not on disk yet. Concurrent requests for the same export wait for the
+    # first one. Returns the path of the export file.
+    path = export_path(source_key, output_format, columns, root)
+    with _export_lock(path):
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+        os.makedirs(root, exist_ok=True)
+        writer = ResultWriter(path, output_format, columns)
+        try:
+            for df in chunks():
+                if not df.empty: writer.write(df)
+            writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+    _prune_exports(root)
+    return path
+
+def _prune_exports(root, max_files=EXPORT_MAX_FILES):
+    paths = [os.path.join(root, name) for name in os.listdir(root) if name.startswith('sentiments-') and not name.endswith('.tmp')]
+    if len(paths) <= max_files: return
+    paths.sort(key=lambda path: os.path.getmtime(path), reverse=True)
+    for path in paths[max_files:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def read_export(path):
+    with open(path, 'rb') as f:
+        return f.read()
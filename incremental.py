@@ -0,0 +1,222 @@
+# incremental.py
+import glob
+import hashlib
+import io
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from processing import (
+    filter_data_by_keywords_and_language,
+    clean_tweets,
+    score_sentiment,
+    new_sentiment_aggregates,
+    update_sentiment_aggregates,
+    parse_datetimes,
+)
+
+# --- Incremental Append-Only Analysis ---
+# The export CSV only grows, so the byte offset of the last analyzed row is used as
+# the high-water mark. Each refresh parses only the bytes appended since then,
+# filters them, drops texts already analyzed (sorted uint64 hash parts, probed with
+# searchsorted), cleans and scores the remaining rows, and appends:
+#   results-NNNNNN.arrow    analyzed rows of that refresh
+#   hashes-NNNNNN.npy       sorted text hashes of that refresh
+#   state.json              offset, columns, prefix digest, aggregates
+# Parts are numbered; state.json commits them together with the offset, so parts at
+# or above its next_part (left by a refresh that failed before saving the state) are
+# ignored and removed by the next refresh, which reads the same rows again.
+# If the file shrank or its beginning changed, the store is rebuilt from scratch.
+INCREMENTAL_ROOT = os.path.join('.cache', 'incremental')
+STATE_VERSION = 2
+MAX_HASH_PARTS = 16
+_PREFIX_BYTES = 64 * 1024
+_store_locks = {}
+_store_locks_guard = threading.Lock()
+
+def store_dir_for(csv_path, selected_keywords, language='en', root=INCREMENTAL_ROOT):
+    key = json.dumps([os.path.abspath(csv_path), sorted(kw.lower() for kw in selected_keywords), language.lower()])
+    key_hash = hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(root, f"{os.path.splitext(os.path.basename(csv_path))[0]}-{key_hash}")
+
+def _store_lock(store_dir):
+    with _store_locks_guard:
+        return _store_locks.setdefault(os.path.abspath(store_dir), threading.Lock())
+
+def _prefix_digest(csv_path, length):
+    with open(csv_path, 'rb') as f:
+        return hashlib.blake2b(f.read(min(length, _PREFIX_BYTES)), digest_size=16).hexdigest()
+
+def _text_hashes(texts):
+    return pd.util.hash_array(texts.astype(str).to_numpy(dtype=object))
+
+class IncrementalStore:
+    def __init__(self, csv_path, selected_keywords, language='en', root=INCREMENTAL_ROOT):
+        self.csv_path = csv_path
+        self.selected_keywords = list(selected_keywords)
+        self.language = language
+        self.store_dir = store_dir_for(csv_path, selected_keywords, language, root)
+        self.state = self._load_state()
+
+    # --- State ---
+    def _new_state(self):
+        return {
+            'version': STATE_VERSION,
+            'byte_offset': 0,
+            'columns': None,
+            'prefix_digest': None,
+            'rows_read': 0,
+            'next_part': 0,
+            'max_datetime': None,
+            'aggregates': new_sentiment_aggregates(),
+        }
+
+    def _load_state(self):
+        try:
+            with open(os.path.join(self.store_dir, 'state.json'), encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == STATE_VERSION: return state
+            self._remove_parts()  # written by another version: rebuilt from scratch
+        except OSError:
+            pass
+        except ValueError:
+            self._remove_parts()
+        return self._new_state()
+
+    def _save_state(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_path = os.path.join(self.store_dir, 'state.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, os.path.join(self.store_dir, 'state.json'))
+
+    def _remove_parts(self):
+        for path in glob.glob(os.path.join(self.store_dir, 'results-*.arrow')) + glob.glob(os.path.join(self.store_dir, 'hashes-*.npy')):
+            os.remove(path)
+
+    def _parts(self, prefix, extension, committed=True):
+        # Sorted paths of the committed parts (or of the uncommitted ones).
+        paths = sorted(glob.glob(os.path.join(self.store_dir, f"{prefix}-*{extension}")))
+        return [path for path in paths
+                if (int(os.path.basename(path)[len(prefix) + 1:-len(extension)]) < self.state['next_part']) == committed]
+
+    def _remove_uncommitted_parts(self):
+        for path in self._parts('results', '.arrow', committed=False) + self._parts('hashes', '.npy', committed=False):
+            os.remove(path)
+
+    def reset(self):
+        self._remove_parts()
+        self.state = self._new_state()
+
+    @property
+    def aggregates(self):
+        return self.state['aggregates']
+
+    # --- Seen-text hashes ---
+    def _hash_parts(self):
+        return self._parts('hashes', '.npy')
+
+    def _seen_mask(self, hashes):
+        seen = np.zeros(len(hashes), dtype=bool)
+        for path in self._hash_parts():
+            part = np.load(path, mmap_mode='r')
+            if len(part) == 0: continue
+            positions = np.minimum(np.searchsorted(part, hashes), len(part) - 1)
+            seen |= part[positions] == hashes
+        return seen
+
+    def _compact_hash_parts(self):
+        parts = self._hash_parts()
+        if len(parts) <= MAX_HASH_PARTS: return
+        merged = np.unique(np.concatenate([np.load(path) for path in parts]))
+        tmp_path = os.path.join(self.store_dir, 'merged.tmp.npy')
+        np.save(tmp_path, merged)
+        # The merged part replaces the newest one before the others are removed, so an
+        # interruption leaves duplicate hashes at worst, never missing ones.
+        os.replace(tmp_path, parts[-1])
+        for path in parts[:-1]: os.remove(path)
+
+    # --- Refresh ---
+    def _read_new_rows(self):
+        # Returns (new rows, new byte offset); stops after the last complete line.
+        size = os.path.getsize(self.csv_path)
+        offset = self.state['byte_offset']
+        if offset > size or (offset and _prefix_digest(self.csv_path, offset) != self.state['prefix_digest']):
+            self.reset()
+            offset = 0
+        with open(self.csv_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        end = data.rfind(b'\n') + 1
+        if end == 0: return pd.DataFrame(columns=self.state['columns'] or []), offset
+        buffer = io.BytesIO(data[:end])
+        if offset == 0:
+            df = pd.read_csv(buffer)
+            self.state['columns'] = [str(col) for col in df.columns]
+        else:
+            df = pd.read_csv(buffer, header=None, names=self.state['columns'])
+        return df, offset + end
+
+    def refresh(self, n_workers=1, cache_path=None, engine='vader'):
+        # Analyzes only the rows appended since the last refresh; returns a summary.
+        with _store_lock(self.store_dir):
+            self.state = self._load_state()
+            self._remove_uncommitted_parts()
+            new_rows, new_offset = self._read_new_rows()
+            summary = {'rows_read': len(new_rows), 'rows_analyzed': 0}
+            if new_offset == self.state['byte_offset']: return summary
+            df = filter_data_by_keywords_and_language(new_rows, self.selected_keywords, self.language)
+            if not df.empty and 'Text' in df.columns:
+                df = df.drop_duplicates(subset=['Text'])
+                hashes = _text_hashes(df['Text'])
+                is_new = ~self._seen_mask(hashes)
+                df, hashes = df[is_new], hashes[is_new]
+            if not df.empty and 'Text' in df.columns:
+                df_analyzed = score_sentiment(clean_tweets(df), n_workers, cache_path=cache_path, engine=engine)
+                # Everything that can fail on the data runs before the part is written;
+                # the part only counts once the state below is saved.
+                update_sentiment_aggregates(self.state['aggregates'], df_analyzed)
+                if 'Datetime' in df_analyzed.columns:
+                    max_datetime = parse_datetimes(df_analyzed['Datetime']).max()
+                    if pd.notna(max_datetime):
+                        max_datetime = max_datetime.isoformat()
+                        if self.state['max_datetime'] is None or max_datetime > self.state['max_datetime']:
+                            self.state['max_datetime'] = max_datetime
+                part = self.state['next_part']
+                os.makedirs(self.store_dir, exist_ok=True)
+                feather.write_feather(pa.Table.from_pandas(df_analyzed, preserve_index=False),
+                                      os.path.join(self.store_dir, f"results-{part:06d}.arrow"))
+                np.save(os.path.join(self.store_dir, f"hashes-{part:06d}.npy"), np.sort(hashes))
+                self.state['next_part'] = part + 1
+                summary['rows_analyzed'] = len(df_analyzed)
+            self.state['byte_offset'] = new_offset
+            self.state['prefix_digest'] = _prefix_digest(self.csv_path, new_offset)
+            self.state['rows_read'] += len(new_rows)
+            self._save_state()
+            self._compact_hash_parts()
+            return summary
+
+    def iter_results(self, columns=None):
+        # Analyzed rows one refresh part at a time, e.g. for exports larger than memory.
+        for path in self._parts('results', '.arrow'):
+            yield feather.read_table(path, columns=columns).to_pandas()
+
+    def load_results(self, columns=None):
+        parts = list(self.iter_results(columns))
+        if not parts: return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True)
+
+def run_incremental_analysis(csv_path, selected_keywords, language='en', n_workers=1, cache_path=None, root=INCREMENTAL_ROOT, engine='vader'):
+    # Returns (store, summary, error) in the style of load_data.
+    try:
+        store = IncrementalStore(csv_path, selected_keywords, language, root)
+        return store, store.refresh(n_workers, cache_path, engine), None
+    except FileNotFoundError:
+        return None, None, f"Error: {csv_path} not found."
+    except Exception as e:
+        return None, None, f"Error analyzing {csv_path}: {e}"
@@ -0,0 +1,220 @@
+# jobs.py
+import functools
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from batch import run_batch_job, output_paths
+from caching import set_cache_backend
+from columnar_dataset import csv_fingerprint
+from processing import shutdown_scoring_pools, SCORE_CACHE_PATH, SENTIMENT_LABELS
+from shared_store import analysis_key
+
+# --- Background Job Scheduler ---
+# Analyses of (input file, keywords, language) run in a pool of worker processes,
+# outside the Streamlit script run, through the batch pipeline (load -> filter ->
+# clean -> score, chunk by chunk):
+#   scheduler = JobScheduler(max_workers=2)
+#   scheduler.submit(['dump-01.csv', 'dump-02.csv'], [['#ChatGPT'], ['#AI', '#GenerativeAI']])
+#   scheduler.jobs()    # status, progress and row counts; poll until 'done'
+# A job is identified by the file fingerprint, the keywords (case- and order-
+# insensitive), the language and the engine: submitting an identical job returns the
+# one already queued, running or done. Each job writes to JOBS_ROOT/<job id>/:
+#   job.json                  spec, status, timings, error
+#   progress.json             rows read/analyzed so far, written by the worker
+#   <name>.sentiment.parquet  analyzed rows, with <name>.aggregates.json (see batch.py)
+# Finished jobs are reloaded from disk by the next scheduler; jobs cut short by a
+# restart are marked 'interrupted' and run again when resubmitted. If a worker
+# process dies (killed, out of memory), the jobs queued or running in the pool are
+# marked 'failed' and the pool is replaced, so that later submissions still run.
+JOBS_ROOT = os.path.join('.cache', 'jobs')
+JOB_STATUSES = ('queued', 'running', 'done', 'failed', 'interrupted')
+_ACTIVE_STATUSES = ('queued', 'running')
+
+def job_id_for(input_path, selected_keywords, language='en', engine='vader'):
+    key = json.dumps(analysis_key('job', csv_fingerprint(input_path), selected_keywords, language, engine))
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _count_lines(path, block_size=1 << 20):
+    # Upper bound of the row count (quoted texts may span lines), for progress only.
+    lines = 0
+    with open(path, 'rb') as f:
+        while block := f.read(block_size):
+            lines += block.count(b'\n')
+    return max(lines - 1, 0)
+
+def _run_job(job_dir, job_kwargs):
+    # Worker entry point.
+    set_cache_backend('local')
+    progress_path = os.path.join(job_dir, 'progress.json')
+    started_at = time.time()
+    total_rows = _count_lines(job_kwargs['input_path'])
+    def progress(rows_read, rows_analyzed):
+        _write_json(progress_path, {
+            'status': 'running', 'started_at': started_at, 'rows_read': rows_read, 'rows_analyzed': rows_analyzed,
+            'progress': min(rows_read / total_rows, 0.99) if total_rows else 0.0,
+        })
+    progress(0, 0)
+    try:
+        return run_batch_job(**job_kwargs, progress=progress)
+    finally:
+        shutdown_scoring_pools()
+
+class JobScheduler:
+    def __init__(self, max_workers=2, root=JOBS_ROOT):
+        self.root = root
+        self.max_workers = max_workers
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+        self._load_jobs()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _replace_executor(self, broken):
+        # Called with the lock held; a no-op if the broken pool was already replaced.
+        if self._executor is not broken: return
+        self._executor = self._new_executor()
+        # Its pending jobs have already failed; cancelling them here would run their
+        # callbacks in this thread, with the lock held.
+        broken.shutdown(wait=False)
+
+    def _load_jobs(self):
+        if not os.path.isdir(self.root): return
+        for name in os.listdir(self.root):
+            job = _read_json(os.path.join(self.root, name, 'job.json'))
+            if job is None: continue
+            if job['status'] in _ACTIVE_STATUSES:
+                job['status'] = 'interrupted'
+                self._save(job)
+            elif job['status'] == 'done' and not os.path.exists(job['aggregates']):
+                continue
+            self._jobs[job['id']] = job
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def _save(self, job):
+        _write_json(os.path.join(self._job_dir(job['id']), 'job.json'), job)
+
+    # --- Submission ---
+    def submit(self, input_paths, keyword_sets, language='en', engine='vader', n_workers=1, cache_path=SCORE_CACHE_PATH):
+        # One job per (input file, keyword set); returns their ids in submission order.
+        return [self.submit_job(input_path, keywords, language, engine, n_workers, cache_path)
+                for input_path in input_paths for keywords in keyword_sets]
+
+    def submit_job(self, input_path, selected_keywords, language='en', engine='vader', n_workers=1, cache_path=SCORE_CACHE_PATH):
+        job_id = job_id_for(input_path, selected_keywords, language, engine)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job['status'] in _ACTIVE_STATUSES + ('done',): return job_id
+            job_dir = self._job_dir(job_id)
+            os.makedirs(job_dir, exist_ok=True)
+            results_path, aggregates_path = output_paths(input_path, job_dir, 'parquet')
+            job = self._jobs[job_id] = {
+                'id': job_id, 'input': os.path.abspath(input_path), 'keywords': list(selected_keywords),
+                'language': language, 'engine': engine, 'status': 'queued',
+                'submitted_at': time.time(), 'started_at': None, 'finished_at': None,
+                'rows_read': 0, 'rows_analyzed': 0, 'progress': 0.0, 'error': None,
+                'results': results_path, 'aggregates': aggregates_path,
+            }
+            if os.path.exists(os.path.join(job_dir, 'progress.json')): os.remove(os.path.join(job_dir, 'progress.json'))
+            # Temporary files of a previous run of this job, left by a killed worker: no
+            # worker is running it now, and the next one writes under its own pid.
+            for tmp_path in glob.glob(os.path.join(job_dir, '*.tmp')): os.remove(tmp_path)
+            self._save(job)
+            job_kwargs = {
+                'input_path': input_path, 'selected_keywords': list(selected_keywords), 'language': language,
+                'output_dir': job_dir, 'output_format': 'parquet', 'n_workers': n_workers, 'cache_path': cache_path, 'engine': engine,
+            }
+            for attempt in range(2):
+                executor = self._executor
+                try:
+                    future = executor.submit(_run_job, job_dir, job_kwargs)
+                    break
+                except BrokenProcessPool as e:
+                    # The pool broke since the last submission and its callbacks may not
+                    # have run yet: replace it once, then give up on this job.
+                    self._replace_executor(executor)
+                    if attempt:
+                        job.update(status='failed', finished_at=time.time(), error=f"{type(e).__name__}: {e}")
+                        self._save(job)
+                        raise
+        future.add_done_callback(functools.partial(self._finish, job_id, executor))
+        return job_id
+
+    def _finish(self, job_id, executor, future):
+        progress = _read_json(os.path.join(self._job_dir(job_id), 'progress.json')) or {}
+        with self._lock:
+            job = self._jobs[job_id]
+            job['started_at'] = progress.get('started_at')
+            job['finished_at'] = time.time()
+            error = None if future.cancelled() else future.exception()
+            if isinstance(error, BrokenProcessPool): self._replace_executor(executor)
+            if future.cancelled():
+                job['status'] = 'interrupted'
+            elif error is not None:
+                job['status'], job['error'] = 'failed', f"{type(error).__name__}: {error}"
+            else:
+                summary = future.result()
+                job.update(status='done', rows_read=summary['rows_read'], rows_analyzed=summary['rows_analyzed'], progress=1.0)
+            self._save(job)
+
+    # --- Polling ---
+    def jobs(self):
+        # All known jobs, most recently submitted first, with the progress of running ones.
+        with self._lock:
+            jobs = [dict(job) for job in self._jobs.values()]
+        for job in jobs:
+            if job['status'] in _ACTIVE_STATUSES:
+                job.update(_read_json(os.path.join(self._job_dir(job['id']), 'progress.json')) or {})
+        return sorted(jobs, key=lambda job: job['submitted_at'], reverse=True)
+
+    def get(self, job_id):
+        return next((job for job in self.jobs() if job['id'] == job_id), None)
+
+    def aggregates(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job['status'] != 'done': return None
+        summary = _read_json(job['aggregates'])
+        return summary['aggregates'] if summary is not None else None
+
+    def comparison(self, job_ids=None):
+        # Sentiment shares of finished jobs, one row per (file, keywords).
+        rows = []
+        for job in self.jobs():
+            if job['status'] != 'done' or (job_ids is not None and job['id'] not in job_ids): continue
+            aggregates = self.aggregates(job['id'])
+            if aggregates is None: continue
+            total = aggregates['rows_analyzed']
+            rows.append({
+                'file': os.path.basename(job['input']), 'keywords': ', '.join(job['keywords']), 'language': job['language'],
+                'tweets': total, **{label: aggregates['sentiment_counts'].get(label, 0) / total if total else None for label in SENTIMENT_LABELS},
+            })
+        return pd.DataFrame(rows, columns=['file', 'keywords', 'language', 'tweets', *SENTIMENT_LABELS])
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -1,31 +1,33 @@
 # processing.py
+import os
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 import pandas as pd
 import re
-import nltk
-import streamlit as st
 
-# NLTK resource download
-try:
-    nltk.data.find('tokenizers/punkt')
-except nltk.downloader.DownloadError:
-    nltk.download('punkt', quiet=True)
-try:
-    nltk.data.find('sentiment/vader_lexicon.zip')
-except nltk.downloader.DownloadError:
-    nltk.download('vader_lexicon', quiet=True)
+from caching import cache_resource, cache_data
+from score_cache import SentimentScoreCache
+from profiling import profile_stage
+from vader_vectorized import VectorizedVader
 
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
+SCORE_CACHE_PATH = os.path.join('.cache', 'sentiment_scores.sqlite')
 
 # --- Data Loading ---
-def load_data(file_path='chatgpt1.csv'):
+@profile_stage
+def load_data(file_path='chatgpt1.csv', nrows=None):
     try:
-        df = pd.read_csv(file_path)
+        df = pd.read_csv(file_path, nrows=nrows)
         return df, None
     except FileNotFoundError:
         return pd.DataFrame(), f"Error: {file_path} not found."
     except Exception as e:
         return pd.DataFrame(), f"Error loading {file_path}: {e}"
 
+@profile_stage
 def filter_data_by_keywords_and_language(df, selected_keywords, language='en'):
     if df is None or df.empty or not selected_keywords:
         return pd.DataFrame()
@@ -39,18 +41,21 @@ def filter_data_by_keywords_and_language(df, selected_keywords, language='en'):
     return df_filtered
 
 # --- Text Cleaning Steps (callable individually) ---
+@profile_stage
 def step_deduplicate_and_lowercase(df_input):
     if df_input is None or 'Text' not in df_input.columns: return df_input
     df = df_input.copy().drop_duplicates(subset=['Text'])
     df['clean_tweet'] = df['Text'].astype(str).str.lower()
     return df
 
+@profile_stage
 def step_remove_urls(df_input):
     if df_input is None or 'clean_tweet' not in df_input.columns: return df_input
     df = df_input.copy()
     df['clean_tweet'] = df['clean_tweet'].str.replace(r"http\S+", "", regex=True)
     return df
 
+@profile_stage
 def step_remove_mentions(df_input):
     if df_input is None or 'clean_tweet' not in df_input.columns: return df_input
     df = df_input.copy()
@@ -63,18 +68,21 @@ def _remove_prefix_words_helper(text, prefix):
     processed_words = [word if not word.startswith(prefix) else ' ' for word in words]
     return re.sub(r'\s+', ' ', " ".join(processed_words)).strip()
 
+@profile_stage
 def step_remove_hashtags_words(df_input):
     if df_input is None or 'clean_tweet' not in df_input.columns: return df_input
     df = df_input.copy()
     df['clean_tweet'] = df['clean_tweet'].apply(lambda x: _remove_prefix_words_helper(x, '#'))
     return df
 
+@profile_stage
 def step_remove_tickers_words(df_input):
     if df_input is None or 'clean_tweet' not in df_input.columns: return df_input
     df = df_input.copy()
     df['clean_tweet'] = df['clean_tweet'].apply(lambda x: _remove_prefix_words_helper(x, '$'))
     return df
 
+@profile_stage
 def step_remove_punctuation_numbers_special(df_input):
     if df_input is None or 'clean_tweet' not in df_input.columns: return df_input
     df = df_input.copy()
@@ -82,12 +90,14 @@ def step_remove_punctuation_numbers_special(df_input):
     df['clean_tweet'] = df['clean_tweet'].str.replace(r'\s+', ' ', regex=True).str.strip()
     return df
 
+@profile_stage
 def step_tokenize_tweets(df_input): 
     if df_input is None or 'clean_tweet' not in df_input.columns: return df_input
     df = df_input.copy()
     df['clean_tweet_tokens'] = df['clean_tweet'].str.split()
     return df
 
+@profile_stage
 def step_remove_short_words_from_tokens(df_input):
     if df_input is None or 'clean_tweet_tokens' not in df_input.columns: return df_input
     df = df_input.copy()
@@ -96,6 +106,7 @@ def step_remove_short_words_from_tokens(df_input):
     df['clean_tweet_tokens'] = df['clean_tweet_tokens'].apply(filter_short_words)
     return df
 
+@profile_stage
 def step_rejoin_tokens(df_input):
     if df_input is None or 'clean_tweet_tokens' not in df_input.columns: return df_input
     df = df_input.copy()
@@ -103,28 +114,340 @@ def step_rejoin_tokens(df_input):
     return df
 
 
+# --- Fused Text Cleaning (production path) ---
+# One regex doing the work of steps 2-6: whole #hashtag/$ticker words, URLs and
+# mentions, then any remaining non-letter character. Matches are removed left to
+# right, so the output is identical to the step chain. URL/mention runs stop at the
+# whitespace of the engine pandas uses for `str.replace`: Python `re` for object
+# columns, RE2 (ASCII whitespace only) for pyarrow-backed string columns.
+def _build_fused_clean_re(run):
+    return re.compile(
+        r"(?<!\S)[#$](?:http{run}+|@{run}+|\S)*|http{run}+|@{run}+|[^a-zA-Z\s]".format(run=run)
+    )
+
+_FUSED_CLEAN_RE = _build_fused_clean_re(r"\S")
+_FUSED_CLEAN_RE_ARROW = _build_fused_clean_re(r"[^\t\n\f\r ]")
+
+def _clean_text_fused(text, pattern=_FUSED_CLEAN_RE):
+    if not isinstance(text, str): return ""
+    return ' '.join([word for word in pattern.sub('', text).split() if len(word) >= 2])
+
+@profile_stage
+def clean_tweets(df_input):
+    # Equivalent to step_deduplicate_and_lowercase -> ... -> step_rejoin_tokens
+    # (without the temporary token column), in a single copy and a single pass.
+    if df_input is None or 'Text' not in df_input.columns: return df_input
+    df = df_input.drop_duplicates(subset=['Text'])
+    lowered = df['Text'].astype(str).str.lower()
+    pattern = _FUSED_CLEAN_RE_ARROW if getattr(lowered.dtype, 'storage', None) == 'pyarrow' else _FUSED_CLEAN_RE
+    df['clean_tweet'] = [_clean_text_fused(text, pattern) for text in lowered]
+    return df
+
+
 # --- Sentiment Analysis ---
-@st.cache_resource
-def get_sentiment_analyzer():
+# NLTK is imported, and the VADER lexicon downloaded if missing, on first use only.
+def ensure_vader_lexicon():
+    import nltk
+    try:
+        nltk.data.find('sentiment/vader_lexicon.zip')
+    except LookupError:
+        nltk.download('vader_lexicon', quiet=True)
+
+def create_sentiment_analyzer():
+    ensure_vader_lexicon()
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
     return SentimentIntensityAnalyzer()
 
-@st.cache_data
-def analyze_sentiment_vader(df_input_processed):
+@cache_resource
+def get_sentiment_analyzer():
+    return create_sentiment_analyzer()
+
+# Scoring engines: 'vader' calls polarity_scores text by text (optionally in a process
+# pool); 'vectorized' scores whole batches with NumPy (vader_vectorized.py), with
+# identical compound scores within vader_vectorized.COMPOUND_TOLERANCE, so both share
+# the persistent score cache.
+SCORING_ENGINES = ('vader', 'vectorized')
+
+@cache_resource
+def get_vectorized_scorer():
+    return VectorizedVader(get_sentiment_analyzer())
+
+def label_sentiment(compound):
+    if compound >= 0.05: return 'Positive'
+    elif compound <= -0.05: return 'Negative'
+    else: return 'Neutral'
+
+# --- Parallel Scoring (process pool, one analyzer per worker) ---
+DEFAULT_SCORING_CHUNK_SIZE = 2_000
+_worker_analyzer = None
+
+def _init_scoring_worker():
+    global _worker_analyzer
+    _worker_analyzer = create_sentiment_analyzer()
+
+def _score_chunk_in_worker(texts):
+    return [_worker_analyzer.polarity_scores(text)['compound'] for text in texts]
+
+_scoring_pools = {}
+_scoring_pools_lock = threading.Lock()
+
+def get_scoring_pool(n_workers):
+    # One long-lived pool per worker count, shared by all sessions of the process.
+    # 'spawn' rather than fork: the Streamlit server is multi-threaded.
+    with _scoring_pools_lock:
+        if n_workers not in _scoring_pools:
+            _scoring_pools[n_workers] = ProcessPoolExecutor(
+                max_workers=n_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_scoring_worker,
+            )
+        return _scoring_pools[n_workers]
+
+def discard_scoring_pool(n_workers, pool):
+    # A pool with a dead worker (e.g. killed by the OOM killer) is unusable for good:
+    # drop it so that the next get_scoring_pool call starts a new one.
+    with _scoring_pools_lock:
+        if _scoring_pools.get(n_workers) is pool: del _scoring_pools[n_workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_scoring_pools():
+    # Must be called by processes that exit without running atexit handlers
+    # (e.g. multiprocessing workers), otherwise their pool workers are never joined.
+    with _scoring_pools_lock:
+        for pool in _scoring_pools.values():
+            pool.shutdown()
+        _scoring_pools.clear()
+
+def resolve_worker_count(n_workers):
+    if n_workers is None or n_workers <= 0: return os.cpu_count() or 1
+    return n_workers
+
+def _score_texts_uncached(texts, n_workers=1, chunk_size=DEFAULT_SCORING_CHUNK_SIZE, engine='vader'):
+    # Compound scores in input order. With n_workers > 1 the texts are sharded into
+    # chunks of chunk_size; executor.map yields results in submission order, so the
+    # output is identical to the serial path. n_workers=None/0 uses every core.
+    # The vectorized engine always runs in-process (n_workers is ignored).
+    if engine not in SCORING_ENGINES:
+        raise ValueError(f"Unknown scoring engine: {engine!r} (expected one of {', '.join(SCORING_ENGINES)})")
+    if engine == 'vectorized': return get_vectorized_scorer().compound_scores(texts)
+    n_workers = resolve_worker_count(n_workers)
+    if n_workers == 1 or len(texts) <= chunk_size:
+        sia = get_sentiment_analyzer()
+        return [sia.polarity_scores(text)['compound'] for text in texts]
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    for attempt in range(2):
+        pool = get_scoring_pool(n_workers)
+        try:
+            return [compound for chunk_scores in pool.map(_score_chunk_in_worker, chunks) for compound in chunk_scores]
+        except BrokenProcessPool:
+            discard_scoring_pool(n_workers, pool)
+            if attempt: raise
+
+# --- Persistent Score Cache ---
+@cache_resource
+def get_lexicon_version():
+    # Any change to the lexicon or to NLTK's VADER rules invalidates cached scores.
+    import nltk
+    digest = hashlib.blake2b(nltk.__version__.encode('utf-8'), digest_size=16)
+    for word, valence in sorted(get_sentiment_analyzer().lexicon.items()):
+        digest.update(f"{word}\t{valence}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+@cache_resource
+def get_score_cache(cache_path=SCORE_CACHE_PATH):
+    return SentimentScoreCache(cache_path, get_lexicon_version())
+
+def score_texts(texts, n_workers=1, chunk_size=DEFAULT_SCORING_CHUNK_SIZE, cache_path=None, engine='vader'):
+    # Each distinct text is scored once; with cache_path, texts already in the
+    # persistent cache skip VADER entirely.
+    texts = list(texts)
+    unique_texts = list(dict.fromkeys(texts))
+    if cache_path is None:
+        if len(unique_texts) == len(texts): return _score_texts_uncached(texts, n_workers, chunk_size, engine)
+        scores = {}
+    else:
+        cache = get_score_cache(cache_path)
+        scores = cache.get_many(unique_texts)
+    missing = [text for text in unique_texts if text not in scores]
+    if missing:
+        new_scores = list(zip(missing, _score_texts_uncached(missing, n_workers, chunk_size, engine)))
+        if cache_path is not None: cache.put_many(new_scores)
+        scores.update(new_scores)
+    return [scores[text] for text in texts]
+
+@profile_stage
+def score_sentiment(df_input_processed, n_workers=1, chunk_size=DEFAULT_SCORING_CHUNK_SIZE, cache_path=None, engine='vader'):
+    # Uncached scoring core shared by analyze_sentiment_vader and the streaming pipeline.
     if df_input_processed is None or df_input_processed.empty or 'clean_tweet' not in df_input_processed.columns:
         return df_input_processed
     df = df_input_processed.copy()
-    sia = get_sentiment_analyzer()
     df['clean_tweet'] = df['clean_tweet'].astype(str).fillna('')
-    sentiments = []
-    compound_scores = []
-    for text_cleaned in df['clean_tweet']:
-        scores = sia.polarity_scores(text_cleaned)
-        compound = scores['compound']
-        compound_scores.append(compound)
-        if compound >= 0.05: sentiment = 'Positive'
-        elif compound <= -0.05: sentiment = 'Negative'
-        else: sentiment = 'Neutral'
-        sentiments.append(sentiment)
-    df['Sentiment'] = sentiments
+    compound_scores = score_texts(df['clean_tweet'], n_workers, chunk_size, cache_path, engine)
+    df['Sentiment'] = [label_sentiment(compound) for compound in compound_scores]
     df['Compound_Score'] = compound_scores
-    return df
\ No newline at end of file
+    return df
+
+@profile_stage
+@cache_data
+def analyze_sentiment_vader(df_input_processed, n_workers=1, chunk_size=DEFAULT_SCORING_CHUNK_SIZE, cache_path=None, engine='vader'):
+    return score_sentiment(df_input_processed, n_workers, chunk_size, cache_path, engine)
+
+
+# --- Streaming Pipeline (chunked CSV, running aggregates only) ---
+SENTIMENT_LABELS = ['Positive', 'Negative', 'Neutral']
+# Like-count buckets of the likes x score density (0, 1, 2-4, 5-9, 10-19, ..., >= 5M).
+LIKE_BIN_EDGES = [0] + [m * 10 ** e for e in range(7) for m in (1, 2, 5)]
+
+def iter_data_chunks(file_path='chatgpt1.csv', chunksize=50_000):
+    return pd.read_csv(file_path, chunksize=chunksize)
+
+def new_sentiment_aggregates(score_bins=40):
+    return {
+        'rows_read': 0,
+        'rows_analyzed': 0,
+        'sentiment_counts': {label: 0 for label in SENTIMENT_LABELS},
+        'date_counts': {},  # {'YYYY-MM-DD': {'Positive': n, ...}}
+        'hour_counts': {},  # {'YYYY-MM-DD HH:00': {'Positive': n, ...}}
+        'score_bin_edges': np.linspace(-1.0, 1.0, score_bins + 1).tolist(),
+        'score_histogram': [0] * score_bins,
+        'like_bin_edges': list(LIKE_BIN_EDGES),
+        'likes_score_histogram': [[0] * score_bins for _ in LIKE_BIN_EDGES],  # [like bin][score bin]
+    }
+
+def parse_datetimes(values):
+    # Tweets may carry different UTC offsets, which pandas refuses to mix: everything is
+    # converted to UTC, and unparsable dates become NaT (dropped from the date buckets).
+    return pd.to_datetime(values, errors='coerce', utc=True)
+
+def update_sentiment_aggregates(aggregates, df_analyzed):
+    if df_analyzed is None or df_analyzed.empty or 'Sentiment' not in df_analyzed.columns:
+        return aggregates
+    aggregates['rows_analyzed'] += len(df_analyzed)
+    for label, count in df_analyzed['Sentiment'].value_counts().items():
+        aggregates['sentiment_counts'][label] = aggregates['sentiment_counts'].get(label, 0) + int(count)
+    if 'Compound_Score' in df_analyzed.columns:
+        hist, _ = np.histogram(df_analyzed['Compound_Score'], bins=aggregates['score_bin_edges'])
+        aggregates['score_histogram'] = [a + int(b) for a, b in zip(aggregates['score_histogram'], hist)]
+        if 'LikeCount' in df_analyzed.columns:
+            _update_likes_score_histogram(aggregates, df_analyzed['LikeCount'], df_analyzed['Compound_Score'])
+    if 'Datetime' in df_analyzed.columns:
+        hours = parse_datetimes(df_analyzed['Datetime']).dt.strftime('%Y-%m-%d %H:00')
+        per_hour = pd.DataFrame({'Hour': hours.values, 'Sentiment': df_analyzed['Sentiment'].values}).dropna()
+        for (hour, label), count in per_hour.groupby(['Hour', 'Sentiment']).size().items():
+            for key, bucket in (('hour_counts', hour), ('date_counts', hour[:10])):
+                counts = aggregates[key].setdefault(bucket, {})
+                counts[label] = counts.get(label, 0) + int(count)
+    return aggregates
+
+def _update_likes_score_histogram(aggregates, likes, scores):
+    likes = pd.to_numeric(likes, errors='coerce').to_numpy(dtype=np.float64)
+    scores = pd.to_numeric(scores, errors='coerce').to_numpy(dtype=np.float64)
+    valid = ~np.isnan(likes) & ~np.isnan(scores) & (likes >= 0)
+    score_edges, like_edges = aggregates['score_bin_edges'], aggregates['like_bin_edges']
+    n_score_bins = len(score_edges) - 1
+    like_bins = np.searchsorted(like_edges, likes[valid], side='right') - 1
+    # Same bin convention as np.histogram: the last score bin includes its right edge.
+    score_bins = np.clip(np.searchsorted(score_edges, scores[valid], side='right') - 1, 0, n_score_bins - 1)
+    counts = np.bincount(like_bins * n_score_bins + score_bins, minlength=len(like_edges) * n_score_bins)
+    aggregates['likes_score_histogram'] = (np.array(aggregates['likes_score_histogram']) + counts.reshape(len(like_edges), n_score_bins)).tolist()
+
+def sentiment_counts_from_aggregates(aggregates):
+    counts = pd.Series(aggregates['sentiment_counts'], dtype='int64')
+    return counts[counts > 0].sort_values(ascending=False)
+
+def sentiment_over_time_from_aggregates(aggregates, freq='D'):
+    # freq='D' for daily buckets, 'h' for hourly ones.
+    buckets = aggregates['hour_counts'] if freq == 'h' else aggregates['date_counts']
+    rows = [(bucket, label, count) for bucket, counts in buckets.items() for label, count in counts.items()]
+    df = pd.DataFrame(rows, columns=['Date', 'Sentiment', 'Count'])
+    df['Date'] = pd.to_datetime(df['Date']) if freq == 'h' else pd.to_datetime(df['Date']).dt.date
+    return df.sort_values(['Date', 'Sentiment']).reset_index(drop=True)
+
+def score_histogram_from_aggregates(aggregates):
+    edges = aggregates['score_bin_edges']
+    return pd.DataFrame({
+        'Compound_Score': [(lo + hi) / 2 for lo, hi in zip(edges[:-1], edges[1:])],
+        'Count': aggregates['score_histogram'],
+    })
+
+def like_bin_labels(like_edges):
+    labels = []
+    for lo, hi in zip(like_edges, like_edges[1:] + [None]):
+        if hi is None: labels.append(f"{lo}+")
+        elif hi - lo == 1: labels.append(str(lo))
+        else: labels.append(f"{lo}-{hi - 1}")
+    return labels
+
+def likes_score_density_from_aggregates(aggregates):
+    # Counts per (score bin, like bucket): index = score bin centers, columns = like
+    # buckets up to the highest non-empty one. Empty DataFrame if nothing was binned.
+    counts = np.array(aggregates['likes_score_histogram'])
+    non_empty = np.flatnonzero(counts.sum(axis=1))
+    if len(non_empty) == 0: return pd.DataFrame()
+    counts = counts[:non_empty[-1] + 1]
+    edges = aggregates['score_bin_edges']
+    return pd.DataFrame(counts.T, index=pd.Index([(lo + hi) / 2 for lo, hi in zip(edges[:-1], edges[1:])], name='Compound_Score'),
+                        columns=like_bin_labels(aggregates['like_bin_edges'])[:len(counts)])
+
+def stratified_sample(df, max_rows, by='Sentiment', seed=0):
+    # At most ~max_rows rows, each `by` group keeping its share (and at least one row).
+    if len(df) <= max_rows or by not in df.columns: return df if len(df) <= max_rows else df.sample(n=max_rows, random_state=seed)
+    fraction = max_rows / len(df)
+    parts = [group.sample(n=min(len(group), max(1, round(len(group) * fraction))), random_state=seed) for _, group in df.groupby(by, sort=False)]
+    return pd.concat(parts)
+
+class _SortedHashSet:
+    # uint64 text hashes kept as sorted NumPy blocks probed with searchsorted (as the
+    # incremental store does on disk): 8 bytes per hash. A new block is merged into the
+    # previous one while it is at least as large, so about log2(n) blocks are probed.
+    def __init__(self):
+        self._blocks = []
+
+    def __len__(self):
+        return sum(len(block) for block in self._blocks)
+
+    def contains(self, hashes):
+        seen = np.zeros(len(hashes), dtype=bool)
+        for block in self._blocks:
+            positions = np.minimum(np.searchsorted(block, hashes), len(block) - 1)
+            seen |= block[positions] == hashes
+        return seen
+
+    def add(self, hashes):
+        if len(hashes) == 0: return
+        self._blocks.append(np.unique(hashes))
+        while len(self._blocks) > 1 and len(self._blocks[-2]) <= len(self._blocks[-1]):
+            block = self._blocks.pop()
+            self._blocks[-1] = np.union1d(self._blocks[-1], block)
+
+def iter_analyzed_chunks(file_path, selected_keywords, language='en', chunksize=50_000, n_workers=1, cache_path=None, engine='vader'):
+    # Yields (rows read, analyzed chunk) pairs: filter -> clean -> score chunk by chunk.
+    # Between chunks only the hashes of already-seen texts are kept, so a text is
+    # analyzed once across the whole file, as with the in-memory path. They are the
+    # only state that grows with the input: 8 bytes per unique matching text.
+    seen_text_hashes = _SortedHashSet()
+    for chunk in iter_data_chunks(file_path, chunksize):
+        df = filter_data_by_keywords_and_language(chunk, selected_keywords, language)
+        if df.empty or 'Text' not in df.columns:
+            yield len(chunk), pd.DataFrame()
+            continue
+        df = df.drop_duplicates(subset=['Text'])
+        text_hashes = pd.util.hash_array(df['Text'].astype(str).to_numpy(dtype=object))
+        is_new = ~seen_text_hashes.contains(text_hashes)
+        seen_text_hashes.add(text_hashes[is_new])
+        df = df[is_new]
+        yield len(chunk), score_sentiment(clean_tweets(df), n_workers, cache_path=cache_path, engine=engine) if not df.empty else df
+
+def analyze_csv_streaming(file_path, selected_keywords, language='en', chunksize=50_000, score_bins=40,
+                          n_workers=1, cache_path=None, engine='vader'):
+    # Streaming pipeline keeping only the aggregates of the analyzed chunks.
+    aggregates = new_sentiment_aggregates(score_bins)
+    try:
+        for rows_read, df_analyzed in iter_analyzed_chunks(file_path, selected_keywords, language, chunksize, n_workers, cache_path, engine):
+            aggregates['rows_read'] += rows_read
+            update_sentiment_aggregates(aggregates, df_analyzed)
+    except FileNotFoundError:
+        return aggregates, f"Error: {file_path} not found."
+    except Exception as e:
+        return aggregates, f"Error loading {file_path}: {e}"
+    return aggregates, None
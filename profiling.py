@@ -0,0 +1,154 @@
+# profiling.py
+import contextlib
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import time
+
+import pandas as pd
+
+# --- Stage Instrumentation ---
+# Pipeline stages in processing.py are decorated with @profile_stage and chart blocks in
+# app.py are wrapped in `with profiled_stage(...)`. Nothing is recorded (and the only
+# overhead is a context-variable lookup) unless a StageProfiler is active:
+#   profiler = StageProfiler(cprofile=True)
+#   with profiler.activate():        # or profiler.start() ... profiler.stop()
+#       run_pipeline()
+#   profiler.summary(); profiler.to_json(); profiler.hot_functions()
+# Each record holds the stage name, nesting depth, wall time, rows in/out and the
+# resident memory delta of the process (Linux only, None elsewhere).
+logger = logging.getLogger('sentiment_analyzer.profiling')
+_active_profiler = contextvars.ContextVar('active_profiler', default=None)
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def current_rss_bytes():
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+def count_rows(value):
+    # DataFrames and Series, or the (DataFrame, error) tuples returned by the loaders.
+    if isinstance(value, tuple) and value and isinstance(value[0], (pd.DataFrame, pd.Series)):
+        value = value[0]
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series)) else None
+
+class StageProfiler:
+    def __init__(self, cprofile=False):
+        self.records = []
+        self._depth = 0
+        self._cprofile = cProfile.Profile() if cprofile else None
+
+    def start(self):
+        _active_profiler.set(self)
+        if self._cprofile is not None: self._cprofile.enable()
+
+    def stop(self):
+        if self._cprofile is not None: self._cprofile.disable()
+        if _active_profiler.get() is self: _active_profiler.set(None)
+
+    @contextlib.contextmanager
+    def activate(self):
+        previous = _active_profiler.get()
+        self.start()
+        try:
+            yield self
+        finally:
+            self.stop()
+            _active_profiler.set(previous)
+
+    @contextlib.contextmanager
+    def stage(self, name, rows_in=None):
+        # Yields the record; the caller may set record['rows_out'] before leaving the block.
+        record = {'stage': name, 'depth': self._depth, 'seconds': None, 'rows_in': rows_in, 'rows_out': None, 'memory_delta_bytes': None}
+        self.records.append(record)
+        self._depth += 1
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            rss_after = current_rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                record['memory_delta_bytes'] = rss_after - rss_before
+            self._depth -= 1
+
+    # --- Reports ---
+    def summary(self):
+        # One row per stage (in first-call order), summed over repeated calls (e.g. chunks).
+        columns = ['stage', 'depth', 'calls', 'seconds', 'rows_in', 'rows_out', 'rows_per_sec', 'memory_delta_bytes']
+        if not self.records: return pd.DataFrame(columns=columns)
+        df = pd.DataFrame(self.records)
+        numeric = ['seconds', 'rows_in', 'rows_out', 'memory_delta_bytes']
+        df[numeric] = df[numeric].apply(pd.to_numeric, errors='coerce')
+        total = lambda values: values.sum(min_count=1)
+        grouped = df.groupby(['stage', 'depth'], sort=False).agg(
+            calls=('seconds', 'size'), seconds=('seconds', 'sum'), rows_in=('rows_in', total),
+            rows_out=('rows_out', total), memory_delta_bytes=('memory_delta_bytes', total),
+        ).reset_index()
+        grouped['rows_per_sec'] = (grouped['rows_in'] / grouped['seconds']).where(grouped['rows_in'] > 0)
+        grouped[['rows_in', 'rows_out', 'memory_delta_bytes']] = grouped[['rows_in', 'rows_out', 'memory_delta_bytes']].astype('Int64')
+        return grouped[columns]
+
+    def hot_functions(self, limit=25, sort_by='cumulative'):
+        # Top functions of the cProfile run, if the profiler was created with cprofile=True.
+        if self._cprofile is None: return pd.DataFrame()
+        stats = pstats.Stats(self._cprofile, stream=io.StringIO())
+        stats.sort_stats(sort_by)
+        rows = []
+        for func in stats.fcn_list[:limit]:
+            primitive_calls, total_calls, tottime, cumtime, _ = stats.stats[func]
+            filename, line, name = func
+            rows.append({'function': f"{name} ({os.path.basename(filename)}:{line})", 'calls': total_calls,
+                         'tottime': tottime, 'cumtime': cumtime})
+        return pd.DataFrame(rows)
+
+    def to_json(self, indent=2):
+        report = {'stages': self.records}
+        if self._cprofile is not None:
+            report['hot_functions'] = self.hot_functions().to_dict(orient='records')
+        return json.dumps(report, indent=indent, default=float)
+
+    def summary_lines(self):
+        return [f"{'  ' * row.depth}{row.stage}: {row.calls} call(s), {row.seconds:.3f}s, rows {row.rows_in} -> {row.rows_out}, "
+                f"memory delta {row.memory_delta_bytes} bytes" for row in self.summary().itertuples(index=False)]
+
+    def log_summary(self, level=logging.INFO):
+        for line in self.summary_lines():
+            logger.log(level, line)
+
+def get_active_profiler():
+    return _active_profiler.get()
+
+def clear_active_profiler():
+    # Drops a profiler left active by an interrupted run (e.g. a Streamlit rerun).
+    profiler = _active_profiler.get()
+    if profiler is not None: profiler.stop()
+
+@contextlib.contextmanager
+def profiled_stage(name, rows_in=None):
+    # Records the block on the active profiler; yields a throwaway record otherwise.
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield {}
+        return
+    with profiler.stage(name, rows_in) as record:
+        yield record
+
+def profile_stage(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _active_profiler.get()
+        if profiler is None: return func(*args, **kwargs)
+        with profiler.stage(func.__name__, count_rows(args[0]) if args else None) as record:
+            result = func(*args, **kwargs)
+            record['rows_out'] = count_rows(result)
+        return result
+    return wrapper
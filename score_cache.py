@@ -0,0 +1,101 @@
+# score_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+
+# --- Persistent Sentiment Score Cache ---
+# Compound scores keyed by a 128-bit hash of the cleaned text, stored in SQLite.
+# Each lookup refreshes the row's `last_used` tick; when the table grows past
+# max_entries the least recently used rows are evicted. All rows are dropped when
+# the lexicon version differs from the one the cache was filled with.
+_SQLITE_BATCH = 500
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+class SentimentScoreCache:
+    def __init__(self, path, lexicon_version, max_entries=2_000_000):
+        directory = os.path.dirname(path)
+        if directory: os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS scores (text_hash BLOB PRIMARY KEY, compound REAL NOT NULL, last_used INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+        if self._get_meta('lexicon_version') != lexicon_version:
+            self._conn.execute("DELETE FROM scores")
+            self._set_meta('lexicon_version', lexicon_version)
+            self._set_meta('tick', '0')
+        self._conn.commit()
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _next_tick(self):
+        tick = int(self._get_meta('tick') or 0) + 1
+        self._set_meta('tick', str(tick))
+        return tick
+
+    def get_many(self, texts):
+        # Returns {text: compound} for the texts already in the cache.
+        hashes = {text_hash(text): text for text in texts}
+        found = {}
+        with self._lock:
+            tick = self._next_tick()
+            keys = list(hashes)
+            for i in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[i:i + _SQLITE_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(f"SELECT text_hash, compound FROM scores WHERE text_hash IN ({placeholders})", batch).fetchall()
+                for key, compound in rows:
+                    found[hashes[key]] = compound
+                self._conn.execute(f"UPDATE scores SET last_used = ? WHERE text_hash IN ({placeholders})", [tick] + batch)
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, text_scores):
+        with self._lock:
+            tick = self._next_tick()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO scores (text_hash, compound, last_used) VALUES (?, ?, ?)",
+                [(text_hash(text), compound, tick) for text, compound in text_scores],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        excess = self._count() - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM scores WHERE text_hash IN (SELECT text_hash FROM scores ORDER BY last_used LIMIT ?)", (excess,)
+            )
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': self._count(),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM scores")
+            self._conn.commit()
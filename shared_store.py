@@ -0,0 +1,161 @@
+# shared_store.py
+import sys
+import threading
+import time
+import weakref
+
+import pandas as pd
+
+# --- Process-Wide Shared Store ---
+# Results that every session would otherwise compute and hold on its own (filtered
+# tweets, analyzed tweets) are kept once per process, keyed for instance by
+# (kind, file fingerprint, keywords, language, scoring engine):
+#   handle = get_shared_store().acquire(key, compute)   # compute() runs once per key,
+#   df = handle.value                                    # concurrent callers wait for it
+# Each handle holds a reference on its entry until handle.release() is called or the
+# handle is garbage-collected (e.g. with the session state of a closed browser tab).
+# When the entries exceed the memory budget, the least recently used entries with no
+# reference left are evicted. DataFrames are handed out as shallow copies: with
+# pandas' copy-on-write no data is copied, and a session modifying its frame never
+# modifies the shared one.
+DEFAULT_MEMORY_BUDGET = 1 << 30  # bytes
+
+def estimate_nbytes(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) else int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+def _view(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)): return value.copy(deep=False)
+    if isinstance(value, tuple): return tuple(_view(item) for item in value)
+    return value
+
+class _Entry:
+    __slots__ = ('value', 'nbytes', 'refcount', 'last_used', 'ready', 'error', 'abandoned')
+
+    def __init__(self):
+        self.value = None
+        self.nbytes = 0
+        self.refcount = 0
+        self.last_used = time.monotonic()
+        self.ready = threading.Event()
+        self.error = None
+        self.abandoned = False
+
+class SharedHandle:
+    def __init__(self, store, key, entry):
+        self.key = key
+        self._value = entry.value
+        self._finalizer = weakref.finalize(self, store._release, key, entry)
+
+    @property
+    def value(self):
+        return _view(self._value)
+
+    def release(self):
+        self._finalizer()
+
+class SharedStore:
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self._entries = {}
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0, 'evictions': 0}
+
+    def acquire(self, key, compute):
+        # Returns a SharedHandle on the value for key, calling compute() only if no
+        # other caller has computed it or is computing it. Errors are re-raised to
+        # every waiting caller and nothing is stored. If the computing caller is
+        # interrupted instead (e.g. its Streamlit script run is stopped or rerun), one
+        # of the waiting callers computes the value in its place.
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                owner = entry is None
+                if owner:
+                    entry = self._entries[key] = _Entry()
+                    self._stats['misses'] += 1
+                else:
+                    self._stats['hits' if entry.ready.is_set() else 'waits'] += 1
+                entry.refcount += 1
+            if owner:
+                try:
+                    value = compute()
+                except BaseException as e:
+                    with self._lock:
+                        if self._entries.get(key) is entry: del self._entries[key]
+                        entry.refcount -= 1
+                    if isinstance(e, Exception): entry.error = e
+                    else: entry.abandoned = True
+                    entry.ready.set()
+                    raise
+                nbytes = estimate_nbytes(value)
+                with self._lock:
+                    entry.value, entry.nbytes = value, nbytes
+                    entry.ready.set()
+                    if self._entries.get(key) is entry: self._used_bytes += nbytes
+                    self._evict()
+            else:
+                entry.ready.wait()
+                if entry.error is not None or entry.abandoned:
+                    with self._lock: entry.refcount -= 1
+                    if entry.error is not None: raise entry.error
+                    continue
+            entry.last_used = time.monotonic()
+            return SharedHandle(self, key, entry)
+
+    def _release(self, key, entry):
+        with self._lock:
+            entry.refcount -= 1
+            entry.last_used = time.monotonic()
+            self._evict()
+
+    def _evict(self):
+        # Called with the lock held. Entries still referenced are never evicted, so the
+        # budget can be exceeded while they are in use.
+        if self._used_bytes <= self.memory_budget: return
+        idle = sorted((entry.last_used, key) for key, entry in self._entries.items() if entry.refcount <= 0 and entry.ready.is_set())
+        for _, key in idle:
+            if self._used_bytes <= self.memory_budget: break
+            self._used_bytes -= self._entries.pop(key).nbytes
+            self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry.ready.is_set()]:
+                self._used_bytes -= self._entries.pop(key).nbytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                'entries': sum(entry.ready.is_set() for entry in self._entries.values()),
+                'references': sum(max(entry.refcount, 0) for entry in self._entries.values()),
+                'used_bytes': self._used_bytes,
+                'memory_budget': self.memory_budget,
+            }
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_shared_store(memory_budget=None):
+    # The process-wide store; memory_budget (bytes) updates its budget when given.
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = SharedStore(DEFAULT_MEMORY_BUDGET if memory_budget is None else memory_budget)
+        elif memory_budget is not None and memory_budget != _default_store.memory_budget:
+            with _default_store._lock:
+                _default_store.memory_budget = memory_budget
+                _default_store._evict()
+        return _default_store
+
+def analysis_key(kind, fingerprint, selected_keywords, language='en', engine=None):
+    # Keyword matching is case-insensitive and order-independent, so e.g. ['#AI',
+    # '#ChatGPT'] and ['#chatgpt', '#ai'] share their results. engine is the scoring
+    # engine of scored results (None for the others).
+    keywords = tuple(sorted({keyword.lower() for keyword in selected_keywords}))
+    return (kind, tuple(sorted(fingerprint.items())) if isinstance(fingerprint, dict) else fingerprint, keywords, language.lower(), engine)
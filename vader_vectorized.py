@@ -0,0 +1,252 @@
+# vader_vectorized.py
+# Usage (verification against polarity_scores on the cleaned tweets of a CSV):
+#   python vader_vectorized.py chatgpt1.csv [--rows 50000] [--tolerance 1e-4]
+import string
+import time
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+# --- Vectorized VADER Scorer ---
+# Batch equivalent of SentimentIntensityAnalyzer.polarity_scores(text)['compound'],
+# built from the lexicon and constants of an NLTK analyzer:
+#   1. texts are split once into a CSR document-term matrix (indptr + token ids);
+#   2. everything that depends on the token alone (VADER's punctuation stripping,
+#      lexicon valence, booster value, negation, ALL CAPS, special words) is computed
+#      once per distinct token of the batch;
+#   3. the positional rules (caps differential, boosters and negations in the three
+#      preceding tokens, "never so/this", idioms, "least", "kind of", first-occurrence
+#      scoring of repeated tokens, "but", ! and ? emphasis) are evaluated with NumPy
+#      over every token position of the batch at once.
+# The floating-point operations follow NLTK's order, so scores are identical to
+# polarity_scores in practice. COMPOUND_TOLERANCE is the documented bound: one unit of
+# the 4th decimal, which a different summation order (e.g. Python >= 3.12's
+# compensated sum()) can flip after rounding. compare_with_polarity_scores() reports
+# the texts on which the two engines differ by more than a tolerance.
+COMPOUND_TOLERANCE = 1e-4
+DEFAULT_BATCH_SIZE = 100_000
+_PUNCTUATION = frozenset(string.punctuation)
+
+class VectorizedVader:
+    def __init__(self, analyzer):
+        self.lexicon = analyzer.lexicon
+        self.constants = analyzer.constants
+        self._punc_list = sorted(self.constants.PUNC_LIST, key=len, reverse=True)
+        self._multiword_boosters = {phrase for phrase in self.constants.BOOSTER_DICT if ' ' in phrase}
+        self._idioms = [(tuple(phrase.split(' ')), valence) for phrase, valence in self.constants.SPECIAL_CASE_IDIOMS.items()]
+
+    # --- Per-token attributes ---
+    def _normalize_token(self, token):
+        # Token-level equivalent of SentiText._words_and_emoticons: single characters are
+        # dropped, and one leading or trailing PUNC_LIST entry is stripped when what
+        # remains is a word without punctuation ("great!" -> "great", "!!wow" -> "wow").
+        if len(token) <= 1: return None
+        for punc in self._punc_list:
+            if token.endswith(punc) and _is_plain_word(token[:-len(punc)]): return token[:-len(punc)]
+            if token.startswith(punc) and _is_plain_word(token[len(punc):]): return token[len(punc):]
+        return token
+
+    def _token_attributes(self, vocabulary):
+        # One entry per vocabulary token plus a trailing sentinel for "no token".
+        constants = self.constants
+        lowered = [token.lower() for token in vocabulary] + ['']
+        raw = list(vocabulary) + ['']
+        def flags(predicate, values=lowered):
+            return np.fromiter((predicate(value) for value in values), dtype=bool, count=len(values))
+        return {
+            'valence': np.array([self.lexicon.get(token, 0.0) for token in lowered], dtype=np.float64),
+            'in_lexicon': flags(lambda token: token in self.lexicon),
+            'booster': np.array([constants.BOOSTER_DICT.get(token, 0.0) for token in lowered], dtype=np.float64),
+            'is_booster': flags(lambda token: token in constants.BOOSTER_DICT),
+            'is_upper': flags(str.isupper, raw),
+            'negated': flags(lambda token: token in constants.NEGATE or "n't" in token),
+            'kind': flags(lambda token: token == 'kind'),
+            'of': flags(lambda token: token == 'of'),
+            'but': flags(lambda token: token == 'but'),
+            'least': flags(lambda token: token == 'least'),
+            'at_or_very': flags(lambda token: token in ('at', 'very')),
+            'never': flags(lambda token: token == 'never', raw),
+            'so_or_this': flags(lambda token: token in ('so', 'this'), raw),
+        }
+
+    # --- Document-term matrix ---
+    def _tokenize(self, texts):
+        # Returns (token ids per position, indptr, vocabulary) for the kept tokens.
+        split_texts = [text.split() for text in texts]
+        lengths = np.fromiter(map(len, split_texts), dtype=np.int64, count=len(split_texts))
+        raw_tokens = np.fromiter(chain.from_iterable(split_texts), dtype=object, count=int(lengths.sum()))
+        raw_codes, raw_uniques = pd.factorize(raw_tokens)
+        vocabulary_index = {}
+        raw_to_token_id = np.empty(len(raw_uniques), dtype=np.int64)
+        for code, raw_token in enumerate(raw_uniques):
+            token = self._normalize_token(raw_token)
+            raw_to_token_id[code] = -1 if token is None else vocabulary_index.setdefault(token, len(vocabulary_index))
+        token_ids = raw_to_token_id[raw_codes] if len(raw_codes) else np.empty(0, dtype=np.int64)
+        kept = token_ids >= 0
+        doc_lengths = np.bincount(np.repeat(np.arange(len(texts)), lengths)[kept], minlength=len(texts))
+        indptr = np.concatenate(([0], np.cumsum(doc_lengths)))
+        return token_ids[kept], indptr, list(vocabulary_index)
+
+    # --- Scoring ---
+    def compound_scores(self, texts, batch_size=DEFAULT_BATCH_SIZE):
+        # Compound scores (rounded to 4 decimals, like polarity_scores) in input order.
+        texts = list(texts)
+        scores = []
+        for start in range(0, len(texts), batch_size):
+            scores.extend(self._score_batch(texts[start:start + batch_size]))
+        return scores
+
+    def _score_batch(self, texts):
+        constants = self.constants
+        n_docs = len(texts)
+        token_ids, indptr, vocabulary = self._tokenize(texts)
+        attrs = self._token_attributes(vocabulary)
+        sentinel = len(vocabulary)
+        doc_lengths = np.diff(indptr)
+        doc = np.repeat(np.arange(n_docs), doc_lengths)
+        position = np.arange(len(token_ids)) - indptr[doc]
+
+        def neighbor(at, offset):
+            # Token ids `offset` positions away from positions `at` in the same document, else the sentinel.
+            ids = np.full(len(at), sentinel, dtype=np.int64)
+            valid = (position[at] + offset >= 0) & (position[at] + offset < doc_lengths[doc[at]])
+            ids[valid] = token_ids[at[valid] + offset]
+            return ids
+
+        upper_counts = np.bincount(doc, weights=attrs['is_upper'][token_ids], minlength=n_docs)
+        cap_diff_docs = (upper_counts > 0) & (upper_counts < doc_lengths)
+
+        # sentiment_valence(), evaluated only at lexicon tokens that are neither boosters
+        # nor the "kind" of "kind of"; every other token has a valence of 0.
+        candidates = np.flatnonzero(attrs['in_lexicon'][token_ids] & ~attrs['is_booster'][token_ids])
+        candidates = candidates[~(attrs['kind'][token_ids[candidates]] & attrs['of'][neighbor(candidates, 1)])]
+        at = candidates
+        word_ids = token_ids[at]
+        pos = position[at]
+        cap_diff = cap_diff_docs[doc[at]]
+        prev = [neighbor(at, -1), neighbor(at, -2), neighbor(at, -3)]
+        valence = attrs['valence'][word_ids]
+        caps = attrs['is_upper'][word_ids] & cap_diff
+        valence = np.where(caps, np.where(valence > 0, valence + constants.C_INCR, valence - constants.C_INCR), valence)
+        for start_i in range(3):
+            word = prev[start_i]
+            applies = (pos > start_i) & ~attrs['in_lexicon'][word]
+            # scalar_inc_dec()
+            scalar = np.where(valence < 0, -attrs['booster'][word], attrs['booster'][word])
+            caps_booster = attrs['is_booster'][word] & attrs['is_upper'][word] & cap_diff
+            scalar = np.where(caps_booster, np.where(valence > 0, scalar + constants.C_INCR, scalar - constants.C_INCR), scalar)
+            if start_i == 1: scalar = np.where(scalar != 0, scalar * 0.95, scalar)
+            if start_i == 2: scalar = np.where(scalar != 0, scalar * 0.9, scalar)
+            valence = np.where(applies, valence + scalar, valence)
+            # _never_check()
+            if start_i == 0:
+                emphasis = np.zeros(len(at), dtype=bool)
+            elif start_i == 1:
+                emphasis = attrs['never'][prev[1]] & attrs['so_or_this'][prev[0]]
+            else:
+                emphasis = (attrs['never'][prev[2]] & attrs['so_or_this'][prev[1]]) | attrs['so_or_this'][prev[0]]
+            negation = ~emphasis & attrs['negated'][word]
+            valence = np.where(applies & emphasis, valence * (1.5 if start_i == 1 else 1.25), valence)
+            valence = np.where(applies & negation, valence * constants.N_SCALAR, valence)
+            if start_i == 2 and applies.any():
+                idiom_at = np.flatnonzero(applies)
+                valence[idiom_at] = self._idioms_check(valence[idiom_at], at[idiom_at], vocabulary, neighbor)
+        # _least_check()
+        least_before = (pos > 0) & ~attrs['in_lexicon'][prev[0]] & attrs['least'][prev[0]]
+        least_negates = least_before & ((pos == 1) | ~attrs['at_or_very'][prev[1]])
+        valence = np.where(least_negates, valence * constants.N_SCALAR, valence)
+        sentiments = np.zeros(len(token_ids), dtype=np.float64)
+        sentiments[at] = valence
+
+        # Repeated tokens are scored at their first occurrence in the document.
+        keys = doc * (sentinel + 1) + token_ids
+        _, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        sentiments = sentiments[first_index[inverse.ravel()]]
+
+        # _but_check(): halve before the first "but", amplify after it.
+        but_positions = np.flatnonzero(attrs['but'][token_ids])
+        if len(but_positions):
+            but_index = np.full(n_docs, -1, dtype=np.int64)
+            but_docs, first_but = np.unique(doc[but_positions], return_index=True)
+            but_index[but_docs] = position[but_positions[first_but]]
+            but_at = but_index[doc]
+            sentiments = np.where((but_at >= 0) & (position < but_at), sentiments * 0.5,
+                                  np.where((but_at >= 0) & (position > but_at), sentiments * 1.5, sentiments))
+
+        # score_valence(): sums in token order, punctuation emphasis, normalization.
+        sum_s = np.bincount(doc, weights=sentiments, minlength=n_docs)
+        exclamations = np.fromiter((text.count('!') for text in texts), dtype=np.int64, count=n_docs)
+        questions = np.fromiter((text.count('?') for text in texts), dtype=np.int64, count=n_docs)
+        amplifier = np.minimum(exclamations, 4) * 0.292 + np.where(questions > 1, np.where(questions <= 3, questions * 0.18, 0.96), 0)
+        sum_s = np.where(sum_s > 0, sum_s + amplifier, np.where(sum_s < 0, sum_s - amplifier, sum_s))
+        compound = sum_s / np.sqrt(sum_s * sum_s + 15)
+        return [round(score, 4) for score in compound.tolist()]
+
+    def _idioms_check(self, valence, at, vocabulary, neighbor):
+        # Idioms and "kind of"-style booster bigrams around positions `at` (all at least 3 tokens in).
+        ids = {token: token_id for token_id, token in enumerate(vocabulary)}
+        idioms = [(words, value) for words, value in self._idioms if all(word in ids for word in words)]
+        boosters = [tuple(phrase.split(' ')) for phrase in self._multiword_boosters]
+        boosters = [words for words in boosters if all(word in ids for word in words)]
+        if not idioms and not boosters: return valence
+        columns = {offset: neighbor(at, offset) for offset in (-3, -2, -1, 0, 1, 2)}
+        def matches(offsets, words):
+            if len(offsets) != len(words): return np.zeros(len(at), dtype=bool)
+            return np.logical_and.reduce([columns[offset] == ids[word] for offset, word in zip(offsets, words)])
+        # onezero, twoonezero, twoone, threetwoone, threetwo: the first matching sequence
+        # wins; then zeroone and zeroonetwo override (neighbor() yields the sentinel past
+        # the end of the document, so they cannot match there).
+        for sequences in ([(-1, 0), (-2, -1, 0), (-2, -1), (-3, -2, -1), (-3, -2)], [(0, 1)], [(0, 1, 2)]):
+            idiom_value = np.full(len(at), np.nan)
+            for offsets in reversed(sequences):
+                for words, value in idioms:
+                    idiom_value = np.where(matches(offsets, words), value, idiom_value)
+            valence = np.where(np.isnan(idiom_value), valence, idiom_value)
+        booster_bigram = np.zeros(len(at), dtype=bool)
+        for words in boosters:
+            booster_bigram |= matches((-3, -2), words) | matches((-2, -1), words)
+        return np.where(booster_bigram, valence + self.constants.B_DECR, valence)
+
+def _is_plain_word(word):
+    return len(word) > 1 and not any(char in _PUNCTUATION for char in word)
+
+# --- Verification ---
+def compare_with_polarity_scores(analyzer, texts, tolerance=COMPOUND_TOLERANCE, scorer=None):
+    # Texts whose vectorized compound score differs from polarity_scores by more than
+    # `tolerance` (an empty DataFrame when the two engines agree).
+    texts = list(texts)
+    vectorized = np.array((scorer or VectorizedVader(analyzer)).compound_scores(texts))
+    reference = np.array([analyzer.polarity_scores(text)['compound'] for text in texts])
+    difference = np.abs(vectorized - reference)
+    mismatched = np.flatnonzero(difference > tolerance)
+    return pd.DataFrame({
+        'text': [texts[i] for i in mismatched],
+        'polarity_scores': reference[mismatched],
+        'vectorized': vectorized[mismatched],
+        'difference': difference[mismatched],
+    })
+
+
+if __name__ == '__main__':
+    import argparse
+    from processing import load_data, clean_tweets, get_sentiment_analyzer
+
+    parser = argparse.ArgumentParser(description="Compare the vectorized VADER scorer with polarity_scores.")
+    parser.add_argument('csv_path', nargs='?', default='chatgpt1.csv')
+    parser.add_argument('--rows', type=int, help="Rows of the CSV to read (default: all).")
+    parser.add_argument('--raw', action='store_true', help="Score the raw Text column instead of the cleaned tweets.")
+    parser.add_argument('--tolerance', type=float, default=COMPOUND_TOLERANCE)
+    args = parser.parse_args()
+    df, error_msg = load_data(args.csv_path, nrows=args.rows)
+    if error_msg: raise SystemExit(error_msg)
+    texts = df['Text'].astype(str).tolist() if args.raw else clean_tweets(df)['clean_tweet'].tolist()
+    analyzer = get_sentiment_analyzer()
+    scorer = VectorizedVader(analyzer)
+    start = time.perf_counter(); [analyzer.polarity_scores(text) for text in texts]; vader_seconds = time.perf_counter() - start
+    start = time.perf_counter(); scorer.compound_scores(texts); vectorized_seconds = time.perf_counter() - start
+    mismatches = compare_with_polarity_scores(analyzer, texts, args.tolerance, scorer)
+    print(f"{len(texts)} texts: polarity_scores {vader_seconds:.2f}s, vectorized {vectorized_seconds:.2f}s "
+          f"({vader_seconds / vectorized_seconds:.1f}x); {len(mismatches)} mismatch(es) above {args.tolerance}")
+    if not mismatches.empty: print(mismatches.head(20).to_string())
+    raise SystemExit(1 if len(mismatches) else 0)